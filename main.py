@@ -7,16 +7,19 @@ This script orchestrates pipeline execution in two modes:
     - Initial Load (Sat–Sun): Perform a full load of all eligible documents.
 
 Environment Variables:
-    PIPELINE_PHASE: Optional. Override phase selection ("retrieve", "download", "generate").
+    PIPELINE_PHASE: Optional. Override phase selection ("retrieve", "download", "generate", "resume", "stream").
     LOAD_TYPE: Optional. Force load type ("Incremental", "Load").
+    RESUME_EXPERIMENT_ID: Optional. Resume an interrupted streaming run (same as --resume).
     ENV: Deployment environment (dev/test/prod).
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime
 
-from src.pipelines import retrieve_documents, download_documents, generate_questions
+from src.experiment import generate_experiment_id
+from src.pipelines import retrieve_documents, download_documents, generate_questions, stream_documents
 from src.logging import SingletonLogger
 from src.utils import initialize_services
 
@@ -24,15 +27,18 @@ from src.utils import initialize_services
 logger = SingletonLogger().get_logger()
 
 
-def run_pipeline(phase: str, load_type: str) -> None:
+def run_pipeline(phase: str, load_type: str, resume_experiment_id: str | None = None) -> None:
     """
     Dispatch the pipeline phase to the appropriate handler.
 
     Args:
-        phase (str): Pipeline phase. One of ["retrieve", "download", "generate"].
+        phase (str): Pipeline phase. One of ["retrieve", "download", "generate", "resume", "stream"].
         load_type (str): Load type. One of ["Incremental", "Load"].
+        resume_experiment_id (str | None): Experiment id of an interrupted "stream" run to continue.
     """
     logger.info("Starting pipeline phase: %s (Load Type: %s)", phase, load_type)
+    if resume_experiment_id and phase != "stream":
+        logger.warning("Only the stream phase can resume; ignoring resume of %s", resume_experiment_id)
 
     if phase == "retrieve":
         retrieve_documents.retrieve_documents(load_type)
@@ -40,8 +46,14 @@ def run_pipeline(phase: str, load_type: str) -> None:
         download_documents.download_documents(load_type)
     elif phase == "generate":
         logger.info("Triggering question generation (Load Type: %s)...", load_type)
-        # Example call (iterating over docs would be real logic):
-        # generate_questions.generate_questions(folder_name, file_name)
+        generate_questions.generate_all_questions(os.getenv("experiment_id") or generate_experiment_id())
+    elif phase == "resume":
+        # Re-export documents left in DOWNLOADING by a failed run
+        retrieve_documents.resume_pending_documents(os.getenv("experiment_id") or generate_experiment_id())
+    elif phase == "stream":
+        # Retrieve, export and download in one pass with overlapping stages
+        experiment_id = resume_experiment_id or os.getenv("experiment_id") or generate_experiment_id()
+        stream_documents.stream_documents(experiment_id, load_type, resume=resume_experiment_id is not None)
     else:
         logger.error("Invalid pipeline phase: %s", phase)
         raise ValueError(f"Invalid pipeline phase: {phase}")
@@ -69,19 +81,35 @@ def select_load_type() -> str:
         raise ValueError("Unexpected weekday calculation")
 
 
-def select_phase() -> str:
+def select_phase(resume_experiment_id: str | None = None) -> str:
     """
     Determine which pipeline phase to run based on environment variable.
 
+    Args:
+        resume_experiment_id (str | None): When set, default to the resumable "stream" phase.
+
     Returns:
-        str: "retrieve", "download", or "generate".
+        str: "retrieve", "download", "generate", "resume", or "stream".
     """
     override_phase = os.getenv("PIPELINE_PHASE")
     if override_phase:
         return override_phase.lower()
 
     # Default phase when not overridden
-    return "retrieve"
+    return "stream" if resume_experiment_id else "retrieve"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse command-line options.
+
+    Returns:
+        argparse.Namespace: ``resume`` holds the experiment id to resume, if any.
+    """
+    parser = argparse.ArgumentParser(description="SOP document ingestion pipeline")
+    parser.add_argument("--resume", metavar="EXPERIMENT_ID", default=os.getenv("RESUME_EXPERIMENT_ID"),
+                        help="Continue an interrupted stream run from its journal, skipping finished work.")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
@@ -89,11 +117,12 @@ if __name__ == "__main__":
         logger.info("Initializing services...")
         initialize_services()
 
+        args = parse_args()
         load_type = select_load_type()
-        phase = select_phase()
+        phase = select_phase(args.resume)
 
         logger.info("Selected Load Type: %s | Phase: %s", load_type, phase)
-        run_pipeline(phase, load_type)
+        run_pipeline(phase, load_type, args.resume)
 
         logger.info("Pipeline execution completed successfully.")
 
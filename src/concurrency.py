@@ -0,0 +1,99 @@
+"""Bounded, self-tuning worker pools used by the pipelines."""
+from __future__ import annotations
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight tasks driven by observed latency and error rate.
+
+    Every ``window`` completed tasks the limit grows by one while latency stays within
+    ``latency_tolerance`` times the best window average seen and the error rate stays
+    under ``max_error_rate``; otherwise it is cut by ``decrease_factor``. With
+    ``min_limit == max_limit`` it behaves as a plain fixed-size semaphore.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 16, window: int = 20,
+                 max_error_rate: float = 0.1, latency_tolerance: float = 2.0, decrease_factor: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = min(max(initial, min_limit), self.max_limit)
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._samples: deque = deque(maxlen=window)
+        self._baseline: Optional[float] = None
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, ok: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._samples.append((latency, ok))
+            if len(self._samples) == self._samples.maxlen:
+                self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self) -> None:
+        avg_latency = sum(latency for latency, _ in self._samples) / len(self._samples)
+        error_rate = sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+        self._baseline = avg_latency if self._baseline is None else min(self._baseline, avg_latency)
+        previous = self.limit
+        if error_rate > self.max_error_rate or avg_latency > self._baseline * self.latency_tolerance:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+        if self.limit != previous:
+            logger.info("Concurrency limit %d -> %d (avg latency %.2fs, error rate %.0f%%)", previous, self.limit, avg_latency, error_rate * 100)
+        self._samples.clear()
+
+
+def map_concurrently(fn: Callable[[Any], Any], items: Iterable[Any], concurrency: AdaptiveConcurrency,
+                     thread_name_prefix: str = "worker") -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """Run ``fn`` over ``items`` and yield ``(item, result, error)`` in completion order.
+
+    Items are pulled lazily, so ``items`` may be a stream. Exceptions are captured per
+    item and never stop the remaining work.
+    """
+    done: queue.Queue = queue.Queue()
+
+    def run(item: Any) -> None:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = fn(item)
+        except Exception as e:
+            error = e
+        concurrency.release(time.perf_counter() - start, error is None)
+        done.put((item, result, error))
+
+    pending = 0
+    with ThreadPoolExecutor(max_workers=concurrency.max_limit, thread_name_prefix=thread_name_prefix) as executor:
+        for item in items:
+            concurrency.acquire()
+            executor.submit(run, item)
+            pending += 1
+            while True:
+                try:
+                    completed = done.get_nowait()
+                except queue.Empty:
+                    break
+                pending -= 1
+                yield completed
+        while pending:
+            pending -= 1
+            yield done.get()
@@ -1,13 +1,18 @@
 """Generic simple DynamoDB wrapper used by the pipeline."""
 from __future__ import annotations
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, Optional, Sequence
 import boto3
 from botocore.exceptions import ClientError
 
+from src.connectors.dynamodb_batch import BatchWriter, batch_get_items
+from src.connectors.dynamodb_status import DocumentStatusMixin, build_guarded_update, build_status_query, build_status_update, query_items
+from src.exceptions.exceptions import StatusTransitionError
 
-class DynamoDB:
-    def __init__(self, table_name: str, region_name: str | None = None):
+
+class DynamoDB(DocumentStatusMixin):
+    def __init__(self, table_name: str, region_name: str | None = None, status_index: str = "status-site-index"):
         self.table_name = table_name
+        self.status_index = status_index
         self.client = boto3.resource("dynamodb", region_name=region_name)
         self.table = self.client.Table(self.table_name)
 
@@ -18,6 +23,17 @@ class DynamoDB:
         except ClientError:
             raise
 
+    def batch_get_documents(self, file_ids: Iterable[str], max_workers: int = 4) -> Dict[str, Dict]:
+        # meta.client is thread-safe and keeps the resource's Python-type (de)serialization
+        keys = [{"file_id": file_id} for file_id in dict.fromkeys(str(f) for f in file_ids)]
+        items = batch_get_items(self.table.meta.client, self.table_name, keys, max_workers=max_workers)
+        return {str(item["file_id"]): item for item in items}
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[Sequence[str]] = None) -> BatchWriter:
+        # put() takes an item like put_item, delete() an item like delete_document
+        return BatchWriter(self.table.meta.client, self.table_name, serialize_key=lambda item: {"file_id": str(item["file_id"])},
+                           overwrite_by_pkeys=overwrite_by_pkeys)
+
     def put_item(self, item: Dict) -> None:
         self.table.put_item(Item=item)
 
@@ -25,6 +41,30 @@ class DynamoDB:
         # Full overwrite semantics for simplicity in this scaffold
         self.put_item(item)
 
+    def transition_status(self, file_id: str, to_status: str, **attributes) -> None:
+        # Writes only status and the given attributes, and only if the current status allows it
+        try:
+            self.table.update_item(Key={"file_id": str(file_id)}, **build_status_update(to_status, attributes))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                raise StatusTransitionError(f"Document {file_id} cannot transition to {to_status}") from e
+            raise
+
+    def update_if(self, file_id: str, expected: Dict, **attributes) -> None:
+        # Writes only the given attributes, and only while the item still matches expected
+        try:
+            self.table.update_item(Key={"file_id": str(file_id)}, **build_guarded_update(expected, attributes))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                raise StatusTransitionError(f"Document {file_id} no longer matches {expected}") from e
+            raise
+
+    def query_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[Dict]:
+        return query_items(self.table.meta.client, build_status_query(self.table_name, self.status_index, status, site, document_type))
+
+    def file_ids_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[str]:
+        return (str(item["file_id"]) for item in self.query_by_status(status, site, document_type))
+
     def delete_document(self, item: Dict) -> None:
         if "file_id" not in item:
             return
@@ -2,26 +2,83 @@
 from __future__ import annotations
 import json
 import io
+import hashlib
 import boto3
-from typing import Dict, Any
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from src.exceptions.exceptions import ChecksumMismatchError
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+DELETE_OBJECTS_LIMIT = 1000
 
 
 class S3:
-    def __init__(self, bucket: str, region_name: str | None = None):
+    def __init__(self, bucket: str, region_name: str | None = None, max_pool_connections: int = 32,
+                 part_size: int = 8 * 1024 * 1024, max_concurrency: int = 8):
         self.bucket = bucket
-        self.client = boto3.client("s3", region_name=region_name)
+        # One client (and connection pool) shared by every worker thread
+        self.client = boto3.client("s3", region_name=region_name, config=Config(max_pool_connections=max_pool_connections))
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.max_concurrency = max_concurrency
+        self.transfer_config = TransferConfig(multipart_threshold=self.part_size, multipart_chunksize=self.part_size,
+                                              max_concurrency=max_concurrency, use_threads=True)
 
-    def put_object(self, content: str, folder: str, file_name: str) -> None:
+    def put_object(self, content: str, folder: str, file_name: str) -> str:
         key = f"{folder.rstrip('/')}/{file_name}"
-        self.client.put_object(Bucket=self.bucket, Key=key, Body=content.encode("utf-8"))
+        resp = self.client.put_object(Bucket=self.bucket, Key=key, Body=content.encode("utf-8"))
+        return resp.get("ETag", "")
 
     def upload_document(self, prefix: str, document) -> str:
         # document expected to have system_path and file attributes
         key = f"{prefix.rstrip('/')}/{document.file}"
-        with open(document.system_path, "rb") as f:
-            self.client.put_object(Bucket=self.bucket, Key=key, Body=f.read())
+        # Managed transfer: streamed from disk, multipart with concurrent parts above part_size
+        self.client.upload_file(document.system_path, self.bucket, key, Config=self.transfer_config)
+        return f"s3://{self.bucket}/{key}"
+
+    def upload_stream(self, prefix: str, file_name: str, chunks: Iterable[bytes], expected_md5: str | None = None,
+                      part_size: int | None = None) -> str:
+        # Streams chunks into a multipart upload holding at most one part in memory.
+        # The upload is aborted, and nothing becomes visible, if the MD5 does not match.
+        key = f"{prefix.rstrip('/')}/{file_name}"
+        part_size = max(part_size or self.part_size, 5 * 1024 * 1024)
+        md5 = hashlib.md5()
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        try:
+            for chunk in chunks:
+                md5.update(chunk)
+                buffer.extend(chunk)
+                if len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+            checksum = md5.hexdigest()
+            if expected_md5 and checksum != expected_md5.lower():
+                raise ChecksumMismatchError(f"MD5 mismatch for {key}: expected {expected_md5}, got {checksum}")
+            if upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer))
+            else:
+                if buffer:
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts})
+        except Exception:
+            if upload_id is not None:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
         return f"s3://{self.bucket}/{key}"
 
+    def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> Dict[str, Any]:
+        resp = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body)
+        return {"ETag": resp["ETag"], "PartNumber": part_number}
+
     def get_json(self, folder: str, file_name: str) -> Dict[str, str]:
         key = f"{folder.rstrip('/')}/{file_name}"
         try:
@@ -33,12 +90,41 @@ class S3:
         except Exception:
             return {}
 
+    def get_json_if_changed(self, folder: str, file_name: str, etag: str | None = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        # Returns (None, etag) when the object still matches etag, ({}, None) when it does not exist
+        key = f"{folder.rstrip('/')}/{file_name}"
+        kwargs = {"IfNoneMatch": etag} if etag else {}
+        try:
+            resp = self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)
+        except self.client.exceptions.NoSuchKey:
+            return {}, None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                return None, etag
+            raise
+        return json.loads(resp["Body"].read().decode("utf-8")), resp.get("ETag")
+
     def delete_object(self, folder: str, file_name: str) -> None:
         key = f"{folder.rstrip('/')}/{file_name}"
         self.client.delete_object(Bucket=self.bucket, Key=key)
 
+    def _delete_chunk(self, keys: List[str]) -> List[str]:
+        resp = self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True})
+        errors = resp.get("Errors", [])
+        for error in errors:
+            logger.error("Failed to delete s3://%s/%s: %s", self.bucket, error.get("Key"), error.get("Message"))
+        return [error["Key"] for error in errors]
+
+    def delete_objects(self, keys: Iterable[str]) -> List[str]:
+        """Delete keys through DeleteObjects, up to 1000 per call. Returns the keys that failed."""
+        keys = list(dict.fromkeys(keys))
+        chunks = [keys[i:i + DELETE_OBJECTS_LIMIT] for i in range(0, len(keys), DELETE_OBJECTS_LIMIT)]
+        if len(chunks) <= 1:
+            return [key for chunk in chunks for key in self._delete_chunk(chunk)]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks)), thread_name_prefix="s3-delete") as executor:
+            return [key for failed in executor.map(self._delete_chunk, chunks) for key in failed]
+
     def download_document(self, folder: str, file_name: str, local_path: str) -> None:
         key = f"{folder.rstrip('/')}/{file_name}"
-        with open(local_path, "wb") as f:
-            resp = self.client.get_object(Bucket=self.bucket, Key=key)
-            f.write(resp["Body"].read())
+        # Managed transfer: ranged parts fetched concurrently and streamed to disk
+        self.client.download_file(self.bucket, key, local_path, Config=self.transfer_config)
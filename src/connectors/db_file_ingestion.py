@@ -4,30 +4,93 @@ This module intentionally keeps operations simple and testable.
 """
 from __future__ import annotations
 
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, Optional, Sequence
 import boto3
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 
+from src.connectors.dynamodb_batch import BatchWriter, batch_get_items
+from src.connectors.dynamodb_status import DocumentStatusMixin, build_guarded_update, build_status_query, build_status_update, query_items
+from src.exceptions.exceptions import StatusTransitionError
 
-class FileIngestionTable:
+_deserializer = TypeDeserializer()
+
+
+class FileIngestionTable(DocumentStatusMixin):
     table_name: str
 
-    def __init__(self, table_name: str, region_name: str | None = None):
+    def __init__(self, table_name: str, region_name: str | None = None, status_index: str = "status-site-index"):
         self.table_name = table_name
+        self.status_index = status_index
         self.client = boto3.client("dynamodb", region_name=region_name)
 
     def get_document(self, file_id: str) -> Optional[Dict]:
         try:
             resp = self.client.get_item(TableName=self.table_name, Key={"file_id": {"S": file_id}})
-            return resp.get("Item")
+            item = resp.get("Item")
+            return self.from_item(item) if item is not None else None
         except ClientError:
             raise
 
-    def put_document(self, item: Dict) -> None:
+    def batch_get_documents(self, file_ids: Iterable[str], max_workers: int = 4) -> Dict[str, Dict]:
+        keys = [{"file_id": {"S": file_id}} for file_id in dict.fromkeys(str(f) for f in file_ids)]
+        items = batch_get_items(self.client, self.table_name, keys, max_workers=max_workers)
+        return {item["file_id"]["S"]: self.from_item(item) for item in items}
+
+    @staticmethod
+    def stored_item(item: Dict) -> Dict:
+        # The plain dict as it reads back: values stringified, None dropped
+        return {k: str(v) for k, v in item.items() if v is not None}
+
+    @classmethod
+    def to_item(cls, item: Dict) -> Dict:
         # item expected to be a plain dict with string values
-        ddb_item = {k: {"S": str(v)} for k, v in item.items() if v is not None}
-        self.client.put_item(TableName=self.table_name, Item=ddb_item)
+        return {k: {"S": v} for k, v in cls.stored_item(item).items()}
 
-    def delete_document(self, item: Dict) -> None:
+    @staticmethod
+    def from_item(item: Dict) -> Dict:
+        # Reads return plain values, the same shape put_document and batch_writer take
+        return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+    @staticmethod
+    def to_key(item: Dict) -> Dict:
         # item expected to contain 'file_id'
-        self.client.delete_item(TableName=self.table_name, Key={"file_id": {"S": str(item["file_id"])}})
+        return {"file_id": {"S": str(item["file_id"])}}
+
+    def put_document(self, item: Dict) -> None:
+        self.client.put_item(TableName=self.table_name, Item=self.to_item(item))
+
+    def delete_document(self, item: Dict) -> None:
+        self.client.delete_item(TableName=self.table_name, Key=self.to_key(item))
+
+    def transition_status(self, file_id: str, to_status: str, **attributes) -> None:
+        # Writes only status and the given attributes, and only if the current status allows it
+        params = build_status_update(to_status, attributes, wrap=lambda v: {"S": str(v)})
+        try:
+            self.client.update_item(TableName=self.table_name, Key=self.to_key({"file_id": file_id}), **params)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                raise StatusTransitionError(f"Document {file_id} cannot transition to {to_status}") from e
+            raise
+
+    def update_if(self, file_id: str, expected: Dict, **attributes) -> None:
+        # Writes only the given attributes, and only while the item still matches expected
+        params = build_guarded_update(expected, attributes, wrap=lambda v: {"S": str(v)})
+        try:
+            self.client.update_item(TableName=self.table_name, Key=self.to_key({"file_id": file_id}), **params)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                raise StatusTransitionError(f"Document {file_id} no longer matches {expected}") from e
+            raise
+
+    def query_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[Dict]:
+        params = build_status_query(self.table_name, self.status_index, status, site, document_type, wrap=lambda v: {"S": str(v)})
+        return (self.from_item(item) for item in query_items(self.client, params))
+
+    def file_ids_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[str]:
+        return (item["file_id"] for item in self.query_by_status(status, site, document_type))
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[Sequence[str]] = ("file_id",)) -> BatchWriter:
+        # put() and delete() take the same plain dicts as put_document/delete_document
+        return BatchWriter(self.client, self.table_name, serialize_item=self.to_item, serialize_key=self.to_key,
+                           overwrite_by_pkeys=overwrite_by_pkeys)
@@ -0,0 +1,165 @@
+"""Batch helpers shared by the DynamoDB connectors.
+
+The helpers work with both the low-level client (typed attribute values) and a
+resource's ``meta.client`` (plain Python values), since the request and
+response shapes are the same.
+"""
+from __future__ import annotations
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from botocore.exceptions import ClientError
+
+from src.exceptions.exceptions import DDBReadError, DDBWriteError
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+THROTTLING_ERRORS = ("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded")
+
+
+def backoff_delay(attempt: int, base: float = 0.05, cap: float = 5.0) -> float:
+    # Full jitter exponential backoff
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _get_chunk(client, table_name: str, keys: List[Dict[str, Any]], max_attempts: int) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    pending = keys
+    attempt = 0
+    while pending:
+        resp = client.batch_get_item(RequestItems={table_name: {"Keys": pending}})
+        items.extend(resp.get("Responses", {}).get(table_name, []))
+        pending = resp.get("UnprocessedKeys", {}).get(table_name, {}).get("Keys", [])
+        if pending:
+            attempt += 1
+            if attempt >= max_attempts:
+                raise DDBReadError(f"{len(pending)} keys still unprocessed in {table_name} after {attempt} attempts")
+            time.sleep(backoff_delay(attempt))
+    return items
+
+
+def batch_get_items(client, table_name: str, keys: List[Dict[str, Any]], max_workers: int = 4, max_attempts: int = 8) -> List[Dict[str, Any]]:
+    """Fetch ``keys`` with BatchGetItem in 100-key chunks, chunks running concurrently.
+
+    ``UnprocessedKeys`` are retried with jittered exponential backoff. Keys must be unique.
+    """
+    chunks = [keys[i:i + BATCH_GET_LIMIT] for i in range(0, len(keys), BATCH_GET_LIMIT)]
+    if len(chunks) <= 1 or max_workers <= 1:
+        return [item for chunk in chunks for item in _get_chunk(client, table_name, chunk, max_attempts)]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="ddb-get") as executor:
+        results = executor.map(lambda chunk: _get_chunk(client, table_name, chunk, max_attempts), chunks)
+        return [item for chunk_items in results for item in chunk_items]
+
+
+class BatchWriter:
+    """Context manager that buffers puts and deletes into 25-item BatchWriteItem calls.
+
+    Unprocessed items and throttling errors are retried with backoff, and the pause
+    between calls adapts: it grows while DynamoDB pushes back and decays after clean
+    writes. With ``overwrite_by_pkeys`` a later request for the same key replaces a
+    buffered one, since BatchWriteItem rejects duplicate keys in a single call.
+
+    Args:
+        client: Low-level DynamoDB client (or a resource's ``meta.client``).
+        table_name (str): Target table.
+        serialize_item: Maps an item passed to ``put`` to its wire format.
+        serialize_key: Maps an item passed to ``delete`` to its key in wire format.
+        overwrite_by_pkeys (Sequence[str] | None): Key attribute names used to de-duplicate the buffer.
+        max_attempts (int): Attempts per batch before raising ``DDBWriteError``.
+    """
+
+    def __init__(self, client, table_name: str, serialize_item: Callable[[Dict], Dict] = lambda item: item,
+                 serialize_key: Callable[[Dict], Dict] = lambda item: item, overwrite_by_pkeys: Optional[Sequence[str]] = None,
+                 max_attempts: int = 10):
+        self.client = client
+        self.table_name = table_name
+        self.serialize_item = serialize_item
+        self.serialize_key = serialize_key
+        self.overwrite_by_pkeys = list(overwrite_by_pkeys or [])
+        self.max_attempts = max_attempts
+        self._buffer: "OrderedDict[Any, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pause = 0.0
+        self._stats = {"puts": 0, "deletes": 0, "calls": 0, "retried_items": 0, "throttles": 0, "consumed_capacity": 0.0}
+
+    def _buffer_key(self, item: Dict) -> Any:
+        if not self.overwrite_by_pkeys:
+            return object()
+        return tuple(json.dumps(item.get(k), sort_keys=True, default=str) for k in self.overwrite_by_pkeys)
+
+    def _add(self, key: Any, request: Dict, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+            self._buffer.pop(key, None)
+            self._buffer[key] = request
+            if len(self._buffer) < BATCH_WRITE_LIMIT:
+                return
+            batch = [self._buffer.popitem(last=False)[1] for _ in range(BATCH_WRITE_LIMIT)]
+        self._write(batch)
+
+    def put(self, item: Dict) -> None:
+        serialized = self.serialize_item(item)
+        self._add(self._buffer_key(serialized), {"PutRequest": {"Item": serialized}}, "puts")
+
+    def delete(self, item: Dict) -> None:
+        key = self.serialize_key(item)
+        self._add(self._buffer_key(key), {"DeleteRequest": {"Key": key}}, "deletes")
+
+    def flush(self) -> None:
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    return
+                batch = [self._buffer.popitem(last=False)[1] for _ in range(min(BATCH_WRITE_LIMIT, len(self._buffer)))]
+            self._write(batch)
+
+    def _throttled(self) -> None:
+        self._pause = min(5.0, max(0.05, self._pause * 2))
+        self._stats["throttles"] += 1
+
+    def _write(self, batch: List[Dict]) -> None:
+        pending = batch
+        attempt = 0
+        while pending:
+            if self._pause:
+                time.sleep(self._pause)
+            try:
+                resp = self.client.batch_write_item(RequestItems={self.table_name: pending}, ReturnConsumedCapacity="TOTAL")
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in THROTTLING_ERRORS:
+                    raise
+                resp = {"UnprocessedItems": {self.table_name: pending}}
+                self._throttled()
+            self._stats["calls"] += 1
+            for capacity in resp.get("ConsumedCapacity", []):
+                self._stats["consumed_capacity"] += capacity.get("CapacityUnits", 0.0)
+            pending = resp.get("UnprocessedItems", {}).get(self.table_name, [])
+            if not pending:
+                self._pause = self._pause / 2 if self._pause > 0.01 else 0.0
+                return
+            attempt += 1
+            self._stats["retried_items"] += len(pending)
+            if attempt >= self.max_attempts:
+                raise DDBWriteError(f"{len(pending)} items still unprocessed in {self.table_name} after {attempt} attempts")
+            self._throttled()
+            time.sleep(backoff_delay(attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+        stats = self.stats()
+        logger.info("Batch writes to %s: %d puts, %d deletes in %d calls, %.1f write capacity units consumed, %d throttles",
+                    self.table_name, stats["puts"], stats["deletes"], stats["calls"], stats["consumed_capacity"], stats["throttles"])
@@ -0,0 +1,119 @@
+"""Document status transitions and status-index queries shared by the DynamoDB connectors."""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.models.document_status import DocumentStatus, REQUIRED_FROM
+
+
+def _update_expression(sets: List[str], attributes: Dict[str, Any], names: Dict[str, str], values: Dict[str, Any],
+                       wrap: Callable[[Any], Any]) -> str:
+    # Attributes whose value is None are removed; the key and status are never written from attributes
+    removes = []
+    for i, (name, value) in enumerate(attributes.items()):
+        if name in ("file_id", "status"):
+            continue
+        names[f"#a{i}"] = name
+        if value is None:
+            removes.append(f"#a{i}")
+        else:
+            values[f":a{i}"] = wrap(value)
+            sets.append(f"#a{i} = :a{i}")
+    clauses = []
+    if sets:
+        clauses.append("SET " + ", ".join(sets))
+    if removes:
+        clauses.append("REMOVE " + ", ".join(removes))
+    return " ".join(clauses)
+
+
+def build_status_update(to_status: str, attributes: Dict[str, Any], wrap: Callable[[Any], Any] = lambda v: v) -> Dict[str, Any]:
+    """UpdateItem arguments that set ``status`` and the given attributes only if the transition is allowed.
+
+    Attributes whose value is None are removed. ``wrap`` converts values to the client's wire format.
+    """
+    to_status = DocumentStatus(to_status)
+    names = {"#status": "status", "#pk": "file_id"}
+    values = {":to": wrap(to_status.value)}
+    expression = _update_expression(["#status = :to"], attributes, names, values, wrap)
+
+    required = REQUIRED_FROM[to_status]
+    if required is None:
+        condition = "attribute_exists(#pk)"
+    else:
+        for j, status in enumerate(required):
+            values[f":from{j}"] = wrap(status.value)
+        condition = "attribute_exists(#pk) AND #status IN (" + ", ".join(f":from{j}" for j in range(len(required))) + ")"
+    return {"UpdateExpression": expression, "ConditionExpression": condition,
+            "ExpressionAttributeNames": names, "ExpressionAttributeValues": values}
+
+
+def build_guarded_update(expected: Dict[str, Any], attributes: Dict[str, Any], wrap: Callable[[Any], Any] = lambda v: v) -> Dict[str, Any]:
+    """UpdateItem arguments that write ``attributes`` (never status) only while the item matches ``expected``.
+
+    An expected value of None requires the attribute to be absent.
+    """
+    names = {"#pk": "file_id"}
+    values: Dict[str, Any] = {}
+    conditions = ["attribute_exists(#pk)"]
+    for j, (name, value) in enumerate(expected.items()):
+        names[f"#c{j}"] = name
+        if value is None:
+            conditions.append(f"attribute_not_exists(#c{j})")
+        else:
+            values[f":c{j}"] = wrap(value.value if isinstance(value, DocumentStatus) else value)
+            conditions.append(f"#c{j} = :c{j}")
+    expression = _update_expression([], attributes, names, values, wrap)
+    if not expression:
+        raise ValueError("build_guarded_update needs at least one attribute to write")
+    params = {"UpdateExpression": expression,
+              "ConditionExpression": " AND ".join(conditions), "ExpressionAttributeNames": names}
+    if values:
+        params["ExpressionAttributeValues"] = values
+    return params
+
+
+def build_status_query(table_name: str, index_name: str, status: str, site: Optional[str] = None,
+                       document_type: Optional[str] = None, wrap: Callable[[Any], Any] = lambda v: v) -> Dict[str, Any]:
+    """Query arguments for the status GSI (partition key ``status``, sort key ``site``)."""
+    names = {"#status": "status"}
+    values = {":status": wrap(DocumentStatus(status).value)}
+    condition = "#status = :status"
+    params: Dict[str, Any] = {"TableName": table_name, "IndexName": index_name}
+    if site is not None:
+        names["#site"] = "site"
+        values[":site"] = wrap(site)
+        condition += " AND #site = :site"
+    if document_type is not None:
+        names["#document_type"] = "document_type"
+        values[":document_type"] = wrap(document_type)
+        params["FilterExpression"] = "#document_type = :document_type"
+    params.update({"KeyConditionExpression": condition, "ExpressionAttributeNames": names, "ExpressionAttributeValues": values})
+    return params
+
+
+def query_items(client, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    # Follows LastEvaluatedKey so callers can stream arbitrarily large result sets
+    while True:
+        resp = client.query(**params)
+        yield from resp.get("Items", [])
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        params = dict(params, ExclusiveStartKey=last_key)
+
+
+class DocumentStatusMixin:
+    """State-machine helpers on top of a connector's ``transition_status``."""
+
+    def mark_downloading(self, file_id: str, **attributes) -> None:
+        self.transition_status(file_id, DocumentStatus.DOWNLOADING, **attributes)
+
+    def mark_downloaded(self, file_id: str, **attributes) -> None:
+        self.transition_status(file_id, DocumentStatus.OK, **attributes)
+
+    def refresh_metadata(self, file_id: str, **attributes) -> None:
+        # Stored documents only; status is left as it is
+        self.update_if(file_id, {"status": DocumentStatus.OK}, **attributes)
+
+    def mark_deleted(self, file_id: str, **attributes) -> None:
+        self.transition_status(file_id, DocumentStatus.DELETED, **attributes)
@@ -0,0 +1,116 @@
+"""Poller that waits on many Vault export jobs at once.
+
+Jobs are polled from a single schedule with exponential backoff and jitter, and
+each job's documents are handed back as soon as that job completes, in
+completion order rather than submission order.
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from src.exceptions.exceptions import NotReadyException
+from src.logging import SingletonLogger
+from src.models.document import Document
+
+logger = SingletonLogger().get_logger()
+
+ExportJobResult = Tuple[str, List[Document], Optional[Exception]]
+
+
+class ExportJobPoller:
+    """Tracks submitted export jobs; new jobs may be added while results are consumed.
+
+    Args:
+        veeva: Veeva client exposing ``fetch_export_documents_results``.
+        initial_delay (float): Seconds before a job's first poll.
+        max_delay (float): Upper bound on the backoff between two polls of a job.
+        multiplier (float): Backoff growth per unsuccessful poll.
+        jitter (float): Relative +/- randomisation applied to every delay.
+        timeout (float): Seconds after which a job that never completes is reported as failed.
+    """
+
+    def __init__(self, veeva, initial_delay: float = 5.0, max_delay: float = 60.0, multiplier: float = 2.0,
+                 jitter: float = 0.2, timeout: float = 1800.0):
+        self.veeva = veeva
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+        self._schedule: list = []
+        self._seq = itertools.count()
+        self._submitted_at: dict = {}
+        self._attempts: dict = {}
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** attempt)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule_poll(self, job_id: str) -> None:
+        heapq.heappush(self._schedule, (time.monotonic() + self._delay(self._attempts[job_id]), next(self._seq), job_id))
+
+    def add(self, job_id: str) -> None:
+        with self._cond:
+            self._submitted_at[job_id] = time.monotonic()
+            self._attempts[job_id] = 0
+            self._schedule_poll(job_id)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Signal that no more jobs will be added; iteration ends once all tracked jobs finish."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _next_due(self) -> Optional[str]:
+        with self._cond:
+            while True:
+                if not self._schedule:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                due_at, _, job_id = self._schedule[0]
+                wait = due_at - time.monotonic()
+                if wait <= 0:
+                    heapq.heappop(self._schedule)
+                    return job_id
+                self._cond.wait(wait)
+
+    def __iter__(self) -> Iterator[ExportJobResult]:
+        while (job_id := self._next_due()) is not None:
+            try:
+                documents = self.veeva.fetch_export_documents_results(job_id)
+            except NotReadyException:
+                with self._cond:
+                    elapsed = time.monotonic() - self._submitted_at[job_id]
+                    if elapsed < self.timeout:
+                        self._attempts[job_id] += 1
+                        self._schedule_poll(job_id)
+                        continue
+                logger.error("Export job %s not ready after %.0fs; giving up", job_id, elapsed)
+                yield job_id, [], NotReadyException(f"Export job {job_id} not ready after {elapsed:.0f}s")
+                continue
+            except Exception as e:
+                logger.error("Polling export job %s failed: %s", job_id, str(e))
+                yield job_id, [], e
+                continue
+            with self._cond:
+                elapsed = time.monotonic() - self._submitted_at[job_id]
+                attempts = self._attempts[job_id] + 1
+            logger.info("Export job %s completed with %d documents after %.1fs (%d polls)", job_id, len(documents), elapsed, attempts)
+            yield job_id, documents, None
+
+
+def poll_export_jobs(veeva, job_ids: Iterable[str], **kwargs) -> Iterator[ExportJobResult]:
+    poller = ExportJobPoller(veeva, **kwargs)
+    for job_id in job_ids:
+        poller.add(str(job_id))
+    poller.close()
+    return iter(poller)
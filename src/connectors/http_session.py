@@ -0,0 +1,109 @@
+"""Pooled keep-alive HTTP session shared by API connectors.
+
+Wraps a single ``requests.Session`` whose adapter keeps a bounded pool of
+connections per host, and records per-call connect/TLS handshake time.
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+# Connections are opened in the calling thread, so per-call connect time is tracked thread-locally.
+_call_state = threading.local()
+
+
+def _record_connect(seconds: float) -> None:
+    _call_state.connect_seconds = getattr(_call_state, "connect_seconds", 0.0) + seconds
+    _call_state.new_connections = getattr(_call_state, "new_connections", 0) + 1
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class HttpSession:
+    """Thread-safe pooled session.
+
+    Args:
+        pool_connections (int): Number of per-host pools kept alive.
+        pool_maxsize (int): Maximum open connections per host.
+        pool_block (bool): Block callers when a host's pool is exhausted instead of opening extra connections.
+        timeout (float): Default request timeout in seconds.
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, pool_block: bool = True, timeout: float = 60):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "new_connections": 0, "connect_seconds": 0.0, "request_seconds": 0.0}
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        _call_state.connect_seconds = 0.0
+        _call_state.new_connections = 0
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            connect_seconds = _call_state.connect_seconds
+            new_connections = _call_state.new_connections
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["new_connections"] += new_connections
+                self._stats["connect_seconds"] += connect_seconds
+                self._stats["request_seconds"] += elapsed
+            logger.debug("%s %s took %.3fs (connect %.3fs, %d new connection(s))", method, url, elapsed, connect_seconds, new_connections)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats["calls"] or 1
+        stats["avg_request_seconds"] = stats["request_seconds"] / calls
+        stats["connection_reuse_ratio"] = 1 - stats["new_connections"] / calls
+        return stats
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,141 @@
+"""Header-driven adaptive token bucket for Vault API calls.
+
+Vault reports its remaining burst and daily allowance on every response
+(``X-VaultAPI-BurstLimitRemaining`` / ``X-VaultAPI-DailyLimitRemaining``). The
+limiter speeds up while there is headroom, slows down before a limit is reached
+and pauses all callers when Vault answers 429.
+"""
+from __future__ import annotations
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose refill rate follows Vault's limit headers.
+
+    Args:
+        rate (float): Initial requests per second.
+        min_rate (float): Floor the rate never drops below.
+        max_rate (float): Ceiling the rate never grows above.
+        capacity (float): Bucket size, i.e. how many calls may burst back to back.
+        low_watermark (float): Remaining-allowance fraction below which the rate is cut.
+        high_watermark (float): Remaining-allowance fraction above which the rate grows.
+        increase_factor (float): Multiplicative speed-up applied while above the high watermark.
+        throttle_pause (float): Pause in seconds on 429 when Vault sends no Retry-After.
+    """
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.5, max_rate: float = 50.0, capacity: float = 10.0,
+                 low_watermark: float = 0.2, high_watermark: float = 0.5, increase_factor: float = 1.1,
+                 throttle_pause: float = 30.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.capacity = capacity
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.increase_factor = increase_factor
+        self.throttle_pause = throttle_pause
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._burst_limit: Optional[int] = None
+        self._daily_limit: Optional[int] = None
+        self._metrics: Dict[str, Any] = {
+            "acquired": 0, "waited_seconds": 0.0, "throttled": 0,
+            "burst_remaining": None, "daily_remaining": None,
+        }
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self._metrics["acquired"] += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                self._metrics["waited_seconds"] += wait
+            time.sleep(wait)
+
+    def _headroom(self, remaining: Optional[int], limit: Optional[int]) -> Optional[float]:
+        if remaining is None or not limit:
+            return None
+        return remaining / limit
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        burst_remaining = _to_int(headers.get("X-VaultAPI-BurstLimitRemaining"))
+        daily_remaining = _to_int(headers.get("X-VaultAPI-DailyLimitRemaining"))
+        if burst_remaining is None and daily_remaining is None:
+            return
+        with self._lock:
+            # Older Vault versions omit the limit headers; the highest remaining value seen is the best estimate
+            if burst_remaining is not None:
+                self._burst_limit = max(_to_int(headers.get("X-VaultAPI-BurstLimit")) or 0, self._burst_limit or 0, burst_remaining)
+            if daily_remaining is not None:
+                self._daily_limit = max(_to_int(headers.get("X-VaultAPI-DailyLimit")) or 0, self._daily_limit or 0, daily_remaining)
+            self._metrics["burst_remaining"] = burst_remaining
+            self._metrics["daily_remaining"] = daily_remaining
+            fractions = [f for f in (self._headroom(burst_remaining, self._burst_limit), self._headroom(daily_remaining, self._daily_limit)) if f is not None]
+            self._refill(time.monotonic())
+            if not fractions:
+                # Only a zero remaining count with no known limit: treat as exhausted
+                self.rate = self.min_rate
+                return
+            headroom = min(fractions)
+            if headroom < self.low_watermark:
+                self.rate = max(self.min_rate, self.rate * max(headroom / self.low_watermark, 0.1))
+            elif headroom > self.high_watermark:
+                self.rate = min(self.max_rate, self.rate * self.increase_factor)
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        pause = self.throttle_pause if retry_after is None else retry_after
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._metrics["throttled"] += 1
+        logger.warning("Vault API throttled (429); pausing %.1fs, rate lowered to %.2f req/s", pause, self.rate)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["rate"] = self.rate
+            metrics["tokens"] = self._tokens
+            metrics["burst_limit"] = self._burst_limit
+            metrics["daily_limit"] = self._daily_limit
+            metrics["paused_seconds"] = max(0.0, self._paused_until - time.monotonic())
+        return metrics
@@ -0,0 +1,153 @@
+"""Per-run read-through / write-through cache in front of the DynamoDB connectors."""
+from __future__ import annotations
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from src.connectors.dynamodb_status import DocumentStatusMixin
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+class CachedTable(DocumentStatusMixin):
+    """LRU cache keyed by ``file_id`` wrapping ``FileIngestionTable`` or ``DynamoDB``.
+
+    Reads are served from memory when possible (including remembered misses),
+    writes go to DynamoDB first and then update the cached copy, and status
+    transitions and guarded updates invalidate the entry. Other connector methods
+    are delegated as-is.
+    """
+
+    def __init__(self, table, max_size: int = 10000):
+        self.table = table
+        self.max_size = max_size
+        # Cached values use the same shape get_document returns
+        self._stored_item = getattr(table, "stored_item", lambda item: item)
+        self._items: "OrderedDict[str, Optional[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.table, name)
+
+    def _lookup(self, file_id: str) -> tuple[bool, Optional[Dict]]:
+        with self._lock:
+            if file_id not in self._items:
+                self._stats["misses"] += 1
+                return False, None
+            self._items.move_to_end(file_id)
+            self._stats["hits"] += 1
+            return True, copy.deepcopy(self._items[file_id])
+
+    def _store(self, file_id: str, item: Optional[Dict]) -> None:
+        with self._lock:
+            self._items[file_id] = copy.deepcopy(item)
+            self._items.move_to_end(file_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, file_id: str) -> None:
+        with self._lock:
+            self._items.pop(str(file_id), None)
+
+    def get_document(self, file_id: str) -> Optional[Dict]:
+        found, item = self._lookup(str(file_id))
+        if found:
+            return item
+        item = self.table.get_document(file_id)
+        self._store(str(file_id), item)
+        return copy.deepcopy(item)
+
+    def batch_get_documents(self, file_ids: Iterable[str], **kwargs) -> Dict[str, Dict]:
+        result: Dict[str, Dict] = {}
+        missing = []
+        for file_id in dict.fromkeys(str(f) for f in file_ids):
+            found, item = self._lookup(file_id)
+            if not found:
+                missing.append(file_id)
+            elif item is not None:
+                result[file_id] = item
+        if missing:
+            fetched = self.table.batch_get_documents(missing, **kwargs)
+            for file_id in missing:
+                self._store(file_id, fetched.get(file_id))
+            result.update(copy.deepcopy(fetched))
+        return result
+
+    def put_item(self, item: Dict) -> None:
+        self.table.put_item(item)
+        self._store(str(item["file_id"]), self._stored_item(item))
+
+    def put_document(self, item: Dict) -> None:
+        self.table.put_document(item)
+        self._store(str(item["file_id"]), self._stored_item(item))
+
+    def update_document(self, item: Dict) -> None:
+        self.table.update_document(item)
+        self._store(str(item["file_id"]), self._stored_item(item))
+
+    def delete_document(self, item: Dict) -> None:
+        self.table.delete_document(item)
+        if "file_id" in item:
+            self._store(str(item["file_id"]), None)
+
+    def transition_status(self, file_id: str, to_status: str, **attributes) -> None:
+        try:
+            self.table.transition_status(file_id, to_status, **attributes)
+        finally:
+            self.invalidate(file_id)
+
+    def update_if(self, file_id: str, expected: Dict, **attributes) -> None:
+        try:
+            self.table.update_if(file_id, expected, **attributes)
+        finally:
+            self.invalidate(file_id)
+
+    def query_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[Dict]:
+        return self.table.query_by_status(status, site, document_type)
+
+    def file_ids_by_status(self, status: str, site: Optional[str] = None, document_type: Optional[str] = None) -> Iterator[str]:
+        return self.table.file_ids_by_status(status, site, document_type)
+
+    def batch_writer(self, *args, **kwargs) -> "_CachedBatchWriter":
+        return _CachedBatchWriter(self.table.batch_writer(*args, **kwargs), self)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._items)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logger.info("Ingestion table cache: %d hits, %d misses (%.0f%% hit ratio), %d entries, %d evictions",
+                    stats["hits"], stats["misses"], stats["hit_ratio"] * 100, stats["size"], stats["evictions"])
+
+
+class _CachedBatchWriter:
+    def __init__(self, writer, cache: CachedTable):
+        self.writer = writer
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.writer, name)
+
+    def put(self, item: Dict) -> None:
+        self.writer.put(item)
+        self.cache._store(str(item["file_id"]), self.cache._stored_item(item))
+
+    def delete(self, item: Dict) -> None:
+        self.writer.delete(item)
+        self.cache._store(str(item["file_id"]), None)
+
+    def __enter__(self) -> "_CachedBatchWriter":
+        self.writer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.writer.__exit__(exc_type, exc, tb)
@@ -4,11 +4,16 @@ Simplified, resilient Veeva client used by the retrieval and download pipelines.
 """
 from __future__ import annotations
 import os
-import time
+import queue
+import threading
 import urllib.parse
-from typing import List, TypeVar, Literal, Any
+from typing import Iterator, List, TypeVar, Literal, Any
 import requests
 
+from src.connectors.export_poller import poll_export_jobs
+from src.connectors.http_session import HttpSession
+from src.connectors.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from src.connectors.veeva_session import VaultSessionManager
 from src.decorators import retry
 from src.exceptions.exceptions import ExpiredTokenException, NotReadyException
 from src.logging import SingletonLogger
@@ -17,105 +22,215 @@ from src.models.document_metadata import DocumentMetadata
 
 T = TypeVar("T")
 logger = SingletonLogger().get_logger()
+_END_OF_PAGES = object()
 
 
 class Veeva:
     TEMP_FOLDER = "tmp"
 
-    def __init__(self, url: str, username: str, password: str, session_id: str | None = None):
+    def __init__(self, url: str, username: str, password: str, session_id: str | None = None,
+                 pool_connections: int = 4, pool_maxsize: int = 16, pool_block: bool = True, timeout: float = 60,
+                 vql_prefetch: int = 2, max_throttle_retries: int = 3, rate_limit: dict | None = None,
+                 keep_alive_interval: float = 600, export_source: bool = False):
         self.url = url.rstrip("/") + "/"
         self.username = username
         self.password = password
-        self.session_id = session_id or ""
-        self.user_id: str | None = None
+        self.vql_prefetch = vql_prefetch
+        self.max_throttle_retries = max_throttle_retries
+        # Exports return the source file instead of its viewable rendition
+        self.export_source = export_source
+        self.http = HttpSession(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block, timeout=timeout)
+        self.rate_limiter = AdaptiveRateLimiter(**(rate_limit or {}))
+        self.sessions = VaultSessionManager(self._authentication, self._session_keep_alive, session_id, keep_alive_interval)
         logger.info("Veeva client initialized")
 
+    @property
+    def session_id(self) -> str:
+        return self.sessions.session_id
+
+    @property
+    def user_id(self) -> str | None:
+        return self.sessions.user_id
+
     @staticmethod
     def _create_payload(payload: dict) -> str:
         return "&".join([f"{k}={v}" for k, v in payload.items()])
 
+    def _headers(self, extra: dict | None = None) -> dict:
+        # Built per call so a shared pool can serve concurrent callers with the current session id
+        headers = {"Authorization": self.session_id, "Accept": "application/json"}
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        # Every Vault call goes through the shared rate limiter; 429s pause all callers and are replayed
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire()
+            resp = self.http.request(method, url, **kwargs)
+            self.rate_limiter.update(resp.headers)
+            if resp.status_code != 429 or attempt == self.max_throttle_retries:
+                return resp
+            self.rate_limiter.throttled(parse_retry_after(resp.headers.get("Retry-After")))
+            resp.close()
+        return resp
+
+    def _request(self, method: str, path: str, headers: dict | None = None, **kwargs) -> requests.Response:
+        url = path if path.startswith(("http://", "https://")) else urllib.parse.urljoin(self.url, path)
+        return self._send(method, url, headers=self._headers(headers), **kwargs)
+
+    def _check_session(self, resp: requests.Response, result: dict) -> None:
+        if result.get("responseStatus") == "FAILURE":
+            errors = result.get("errors", [])
+            if errors and errors[0].get("type") == "INVALID_SESSION_ID":
+                # Refresh before raising so the @retry replay carries the new session id
+                self.sessions.refresh(resp.request.headers.get("Authorization"))
+                raise ExpiredTokenException()
+
+    def get_http_stats(self) -> dict:
+        return self.http.stats()
+
+    def get_rate_limit_metrics(self) -> dict:
+        return self.rate_limiter.metrics()
+
+    def get_session_metrics(self) -> dict:
+        return self.sessions.metrics()
+
+    def log_stats(self) -> None:
+        http, limits, sessions = self.get_http_stats(), self.get_rate_limit_metrics(), self.get_session_metrics()
+        logger.info("Vault HTTP: %d calls, %d new connections (%.0f%% reuse), %.3fs avg request",
+                    http["calls"], http["new_connections"], http["connection_reuse_ratio"] * 100, http["avg_request_seconds"])
+        logger.info("Vault rate limit: %.2f req/s, %d acquired, %.1fs waited, %d throttled, burst remaining %s, daily remaining %s",
+                    limits["rate"], limits["acquired"], limits["waited_seconds"], limits["throttled"],
+                    limits["burst_remaining"], limits["daily_remaining"])
+        logger.info("Vault sessions: %d authentications, %d refreshes, %d keep-alives (%d failed)",
+                    sessions["authentications"], sessions["refreshes"], sessions["keep_alives"], sessions["keep_alive_failures"])
+
+    def close(self) -> None:
+        self.sessions.stop()
+        self.http.close()
+
     @retry((requests.exceptions.Timeout,), delay=10, times=2)
     def _authentication(self) -> tuple[str, str]:
         url = urllib.parse.urljoin(self.url, "auth")
         payload = {"username": self.username, "password": self.password}
         headers = {"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"}
-        resp = requests.post(url, headers=headers, data=urllib.parse.urlencode(payload), timeout=60)
+        resp = self._send("POST", url, headers=headers, data=urllib.parse.urlencode(payload))
         resp.raise_for_status()
         data = resp.json()
         return data["sessionId"], data["userId"]
 
     @retry((requests.exceptions.Timeout,), delay=10, times=2)
     def _session_keep_alive(self) -> None:
-        url = urllib.parse.urljoin(self.url, "keep-alive")
-        headers = {"Authorization": self.session_id, "Accept": "application/json"}
-        resp = requests.post(url, headers=headers, timeout=60)
+        resp = self._request("POST", "keep-alive")
         resp.raise_for_status()
+        self._check_session(resp, resp.json())
 
     @retry((ExpiredTokenException,), delay=1, times=2)
-    def submit_vql_query(self, model: T, execution_type: Literal["Incremental", "Load"] = "Incremental", id: str | None = None) -> List[T]:
-        url = urllib.parse.urljoin(self.url, "query")
-        if id:
-            url = urllib.parse.urljoin(url + "/", id)
-        query = model.get_query(execution_type)
+    def _fetch_query_page(self, query: str, page_id: str | None = None) -> dict:
+        path = f"query/{page_id}" if page_id else "query"
         encoded_query = urllib.parse.quote(query.encode("ascii"))
         payload = self._create_payload({"q": encoded_query})
-        headers = {"Authorization": self.session_id, "Accept": "application/json", "X-VaultAPI-DescribeQuery": "true", "Content-Type": "application/x-www-form-urlencoded"}
-        resp = requests.post(url, headers=headers, data=payload, timeout=60)
+        headers = {"X-VaultAPI-DescribeQuery": "true", "Content-Type": "application/x-www-form-urlencoded"}
+        resp = self._request("POST", path, headers=headers, data=payload)
         resp.raise_for_status()
         result = resp.json()
-        if result.get("responseStatus") == "FAILURE":
-            errors = result.get("errors", [])
-            if errors and errors[0].get("type") == "INVALID_SESSION_ID":
-                raise ExpiredTokenException()
-        validated = [model.model_validate(x) for x in result.get("data", [])]
-        # handle pagination
-        rd = result.get("responseDetails", {})
-        nxt = rd.get("next_page")
-        if nxt:
-            time.sleep(0.5)
-            nid = nxt.split("/")[-1]
-            validated.extend(self.submit_vql_query(model, execution_type, nid))
-        return validated
+        self._check_session(resp, result)
+        return result
+
+    def iter_vql_pages(self, model: T, execution_type: Literal["Incremental", "Load"] = "Incremental", prefetch: int | None = None,
+                       query: str | None = None) -> Iterator[List[T]]:
+        """Yield validated models one VQL page at a time.
+
+        A background thread fetches up to ``prefetch`` pages ahead while the caller
+        processes the current one, so at most ``prefetch + 1`` raw pages are held in memory.
+        ``query`` overrides ``model.get_query(execution_type)``.
+        """
+        query = query or model.get_query(execution_type)
+        pages: queue.Queue = queue.Queue(maxsize=max(1, prefetch or self.vql_prefetch))
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch_pages() -> None:
+            page_id = None
+            try:
+                while not stop.is_set():
+                    result = self._fetch_query_page(query, page_id)
+                    nxt = result.get("responseDetails", {}).get("next_page")
+                    if not put(result.get("data", [])) or not nxt:
+                        break
+                    page_id = nxt.split("/")[-1]
+            except Exception as e:
+                put(e)
+            finally:
+                put(_END_OF_PAGES)
+
+        fetcher = threading.Thread(target=fetch_pages, name=f"vql-prefetch-{getattr(model, '__name__', 'model')}", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _END_OF_PAGES:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if hasattr(model, "model_validate_many"):
+                    yield model.model_validate_many(item)
+                else:
+                    yield [model.model_validate(x) for x in item]
+        finally:
+            stop.set()
+
+    def submit_vql_query(self, model: T, execution_type: Literal["Incremental", "Load"] = "Incremental", query: str | None = None) -> List[T]:
+        return [x for page in self.iter_vql_pages(model, execution_type, query=query) for x in page]
 
-    @retry((ExpiredTokenException,), delay=1, times=2)
     def submit_export_documents(self, documents: List[DocumentMetadata]) -> str:
-        url = urllib.parse.urljoin(self.url, "objects/documents/batch/actions/fileextract?source=false&renditions=true")
-        payload = "[" + ",".join([d.get_document_id() for d in documents]) + "]"
-        headers = {"Authorization": self.session_id, "Content-Type": "application/json", "Accept": "application/json"}
-        resp = requests.post(url, headers=headers, data=payload.encode("ascii"), timeout=60)
+        return self.submit_export_document_ids([d.file_id for d in documents])
+
+    @retry((ExpiredTokenException,), delay=1, times=2)
+    def submit_export_document_ids(self, file_ids: List[str]) -> str:
+        payload = "[" + ",".join(['{"id": "' + str(file_id) + '"}' for file_id in file_ids]) + "]"
+        headers = {"Content-Type": "application/json"}
+        query = "source=true&renditions=false" if self.export_source else "source=false&renditions=true"
+        resp = self._request("POST", f"objects/documents/batch/actions/fileextract?{query}", headers=headers, data=payload.encode("ascii"))
         resp.raise_for_status()
         result = resp.json()
-        if result.get("responseStatus") == "FAILURE":
-            errors = result.get("errors", [])
-            if errors and errors[0].get("type") == "INVALID_SESSION_ID":
-                raise ExpiredTokenException()
+        self._check_session(resp, result)
         job_id = str(result["job_id"])
         return job_id
 
-    @retry((NotReadyException,), delay=60, times=5)
     @retry((ExpiredTokenException,), delay=1, times=2)
-    def retrieve_export_documents_results(self, job_id: str) -> List[Document]:
-        url = urllib.parse.urljoin(self.url, f"objects/documents/batch/actions/fileextract/{job_id}/results")
-        headers = {"Authorization": self.session_id, "Accept": "application/json"}
-        resp = requests.get(url, headers=headers, timeout=60)
+    def fetch_export_documents_results(self, job_id: str) -> List[Document]:
+        resp = self._request("GET", f"objects/documents/batch/actions/fileextract/{job_id}/results")
         resp.raise_for_status()
         result = resp.json()
         if result.get("responseStatus") == "FAILURE":
-            errors = result.get("errors", [])
-            if errors and errors[0].get("type") == "INVALID_SESSION_ID":
-                raise ExpiredTokenException()
+            self._check_session(resp, result)
             raise NotReadyException()
         documents = [Document.model_validate(x) for x in result.get("data", []) if x.get("responseStatus") == "SUCCESS"]
         return documents
 
+    def retrieve_export_documents_results(self, job_id: str, **poll_options) -> List[Document]:
+        for _, documents, error in poll_export_jobs(self, [job_id], **poll_options):
+            if error is not None:
+                raise error
+            return documents
+        return []
+
     @retry((ExpiredTokenException,), delay=1, times=2)
     def download_item_content(self, document: Document) -> Document:
         item = f"u{document.user_id}/{document.file}"
-        url = urllib.parse.urljoin(self.url, f"services/file_staging/items/content/{item}")
         os.makedirs("tmp", exist_ok=True)
         file_path = os.path.join("tmp", f"{document.id}.pdf")
-        headers = {"Authorization": self.session_id, "Accept": "application/json"}
-        with requests.get(url, headers=headers, stream=True, timeout=60) as resp:
+        with self._request("GET", f"services/file_staging/items/content/{item}", stream=True) as resp:
             resp.raise_for_status()
             with open(file_path, "wb") as f:
                 for chunk in resp.iter_content(chunk_size=8192):
@@ -123,3 +238,15 @@ class Veeva:
         document.system_path = file_path
         document.file = f"{document.id}.pdf"
         return document
+
+    def iter_item_content(self, document: Document, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        # The staging path is resolved now, before callers rename document.file
+        item = f"u{document.user_id}/{document.file}"
+        return self._stream_content(f"services/file_staging/items/content/{item}", chunk_size)
+
+    def _stream_content(self, path: str, chunk_size: int) -> Iterator[bytes]:
+        with self._request("GET", path, stream=True) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
@@ -0,0 +1,83 @@
+"""Vault session lifecycle: lazy authentication, keep-alive and shared refresh."""
+from __future__ import annotations
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+class VaultSessionManager:
+    """Owns the Vault session id shared by every caller of a Veeva client.
+
+    The session is created on first use, kept warm by a background keep-alive
+    timer, and refreshed at most once per expiry: concurrent callers that saw the
+    same dead session id all wait on one re-authentication.
+
+    Args:
+        authenticate: Callable returning ``(session_id, user_id)``.
+        keep_alive: Callable pinging Vault with the current session.
+        session_id (str | None): Pre-provisioned session id to try before authenticating.
+        keep_alive_interval (float): Seconds between keep-alive calls; 0 disables the timer.
+    """
+
+    def __init__(self, authenticate: Callable[[], Tuple[str, str]], keep_alive: Callable[[], None],
+                 session_id: Optional[str] = None, keep_alive_interval: float = 600):
+        self._authenticate_fn = authenticate
+        self._keep_alive_fn = keep_alive
+        self._session_id = session_id or None
+        self.user_id: Optional[str] = None
+        self.keep_alive_interval = keep_alive_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._keep_alive_thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, int] = {"authentications": 0, "refreshes": 0, "keep_alives": 0, "keep_alive_failures": 0}
+
+    @property
+    def session_id(self) -> str:
+        if self._session_id is None:
+            with self._lock:
+                if self._session_id is None:
+                    self._authenticate()
+        self._start_keep_alive()
+        return self._session_id
+
+    def _authenticate(self) -> None:
+        # Caller holds the lock
+        self._session_id, self.user_id = self._authenticate_fn()
+        self._metrics["authentications"] += 1
+        logger.info("Authenticated new Vault session")
+
+    def refresh(self, stale_session_id: Optional[str]) -> None:
+        """Re-authenticate unless another caller already replaced ``stale_session_id``."""
+        with self._lock:
+            if self._session_id is not None and self._session_id != stale_session_id:
+                return
+            self._metrics["refreshes"] += 1
+            logger.warning("Vault session expired; refreshing")
+            self._authenticate()
+
+    def _start_keep_alive(self) -> None:
+        if self.keep_alive_interval <= 0 or self._keep_alive_thread is not None:
+            return
+        with self._lock:
+            if self._keep_alive_thread is None:
+                self._keep_alive_thread = threading.Thread(target=self._keep_alive_loop, name="vault-keep-alive", daemon=True)
+                self._keep_alive_thread.start()
+
+    def _keep_alive_loop(self) -> None:
+        while not self._stop.wait(self.keep_alive_interval):
+            try:
+                self._keep_alive_fn()
+                self._metrics["keep_alives"] += 1
+            except Exception as e:
+                self._metrics["keep_alive_failures"] += 1
+                logger.warning("Vault keep-alive failed: %s", str(e))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics)
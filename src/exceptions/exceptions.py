@@ -19,3 +19,12 @@ class ExpiredTokenException(BaseProcessingException):
 
 class NotReadyException(BaseProcessingException):
     pass
+
+class ChecksumMismatchError(BaseProcessingException):
+    pass
+
+class DDBReadError(BaseProcessingException):
+    pass
+
+class StatusTransitionError(BaseProcessingException):
+    pass
@@ -0,0 +1,164 @@
+"""Concurrent loader and versioned cache for the Veeva lookup tables used to rename document relations."""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.logging import SingletonLogger
+from src.models.constants import LOOKUP_TABLES, RELATIONS
+from src.watermarks import advance_watermark
+
+logger = SingletonLogger().get_logger()
+
+
+def content_hash(data: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class LookupCache:
+    """Two-tier cache for ``constants/<category>.json``.
+
+    A local on-disk copy is revalidated against S3 with ``If-None-Match`` so an
+    unchanged table costs a 304 instead of a download, and ``put`` skips the S3
+    write when a table's content hash has not changed.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, s3, folder: str = "constants", local_dir: str = "tmp/constants"):
+        self.s3 = s3
+        self.folder = folder
+        self.local_dir = local_dir
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, str]] = self._read_local(self.INDEX_FILE) or {}
+
+    def _read_local(self, file_name: str) -> Optional[dict]:
+        path = os.path.join(self.local_dir, file_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_local(self, file_name: str, content: str) -> None:
+        os.makedirs(self.local_dir, exist_ok=True)
+        tmp_path = os.path.join(self.local_dir, f"{file_name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(self.local_dir, file_name))
+
+    def _remember(self, category: str, etag: Optional[str], digest: str) -> None:
+        with self._lock:
+            self._index[category] = {"etag": etag or "", "hash": digest}
+            index = json.dumps(self._index, indent=2, sort_keys=True)
+        self._write_local(self.INDEX_FILE, index)
+
+    def get(self, category: str) -> Dict[str, str]:
+        file_name = f"{category}.json"
+        with self._lock:
+            entry = dict(self._index.get(category, {}))
+        local = self._read_local(file_name) if entry.get("etag") else None
+        try:
+            data, etag = self.s3.get_json_if_changed(self.folder, file_name, entry["etag"] if local is not None else None)
+        except Exception as e:
+            logger.warning("Could not read lookup %s from S3: %s", category, str(e))
+            return local or {}
+        if data is None:
+            logger.debug("Lookup %s unchanged in S3 (etag %s); using local copy", category, etag)
+            return local
+        self._write_local(file_name, json.dumps(data, indent=2))
+        self._remember(category, etag, content_hash(data))
+        return data
+
+    def put(self, category: str, data: Dict[str, str]) -> bool:
+        """Write a table to S3 unless its content is unchanged. Returns True when written."""
+        digest = content_hash(data)
+        with self._lock:
+            unchanged = self._index.get(category, {}).get("hash") == digest
+        if unchanged:
+            logger.info("Lookup %s unchanged; skipping S3 write", category)
+            return False
+        content = json.dumps(data, indent=2)
+        etag = self.s3.put_object(content, self.folder, f"{category}.json")
+        self._write_local(f"{category}.json", content)
+        self._remember(category, etag, digest)
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_lookup_cache(s3) -> LookupCache:
+    return LookupCache(s3)
+
+
+def _timed(fn, *args) -> Tuple[Dict[str, str], float]:
+    start = time.perf_counter()
+    data = fn(*args)
+    return data, time.perf_counter() - start
+
+
+def _fetch_veeva(veeva, model) -> Dict[str, str]:
+    rows = veeva.submit_vql_query(model)
+    advance_watermark(model.__name__, (c.modified_date for c in rows))
+    return {c.id: c.name for c in rows}
+
+
+def load_lookup_tables(veeva, s3, max_workers: int = 8, cache: Optional[LookupCache] = None) -> Dict[str, Dict[str, str]]:
+    """Fetch every lookup table from S3 and Veeva over a bounded worker pool.
+
+    Returns the same shape as the serial ``s3.get_json(...) | {id: name}`` merge:
+    one ``{id: name}`` dict per category, Veeva values overriding the S3 copy.
+    """
+    read_s3 = cache.get if cache is not None else (lambda category: s3.get_json("constants", f"{category}.json"))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lookup") as executor:
+        futures = {
+            category: (
+                executor.submit(_timed, read_s3, category),
+                executor.submit(_timed, _fetch_veeva, veeva, model),
+            )
+            for category, model in LOOKUP_TABLES.items()
+        }
+        veeva_data = {}
+        for category, (s3_future, veeva_future) in futures.items():
+            s3_data, s3_seconds = s3_future.result()
+            vql_data, vql_seconds = veeva_future.result()
+            veeva_data[category] = s3_data | vql_data
+            logger.info("Loaded lookup %s: %d rows from S3 in %.2fs, %d rows from Veeva in %.2fs",
+                        category, len(s3_data), s3_seconds, len(vql_data), vql_seconds)
+    logger.info("Loaded %d lookup tables in %.2fs", len(veeva_data), time.perf_counter() - start)
+    return veeva_data
+
+
+class RelationResolver:
+    """Replaces relation ids on documents with lookup names, compiled once per run.
+
+    Each relation attribute is bound to its lookup table up front (see ``RELATIONS``)
+    and names are interned, so every document referencing the same record shares
+    one string.
+    """
+
+    def __init__(self, veeva_data: Dict[str, Dict[str, str]], relations: Dict[str, str] = RELATIONS):
+        tables = {category: {key: sys.intern(name) if isinstance(name, str) else name for key, name in table.items()}
+                  for category, table in veeva_data.items()}
+        self._relations: List[Tuple[str, Dict[str, str]]] = [(attr, tables[category]) for attr, category in relations.items() if tables.get(category)]
+        missing = sorted({category for category in relations.values() if not tables.get(category)})
+        if missing:
+            logger.warning("No lookup data for %s; those relations keep their ids", ", ".join(missing))
+
+    def resolve(self, document) -> None:
+        for attr, table in self._relations:
+            value = getattr(document, attr, None)
+            if isinstance(value, list):
+                setattr(document, attr, [table.get(v, v) for v in value])
+            elif value is not None:
+                setattr(document, attr, table.get(value, value))
+
+    def resolve_many(self, documents: Iterable) -> None:
+        resolve = self.resolve
+        for document in documents:
+            resolve(document)
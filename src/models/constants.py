@@ -1,20 +1,22 @@
-from typing import Dict, Literal, Any
-from src.experiment import get_two_days_records
+from datetime import datetime
+from typing import Dict, Literal, Any, Optional
+from src.watermarks import get_incremental_since, parse_vault_datetime
 
 class Constant:
     table_name: str
 
-    def __init__(self, id: str, name: str):
+    def __init__(self, id: str, name: str, modified_date: Optional[datetime] = None):
         self.id = id
         self.name = name
+        self.modified_date = modified_date
 
     @classmethod
     def get_query(cls, _: Literal["Incremental", "Load"]) -> str:
-        return f"SELECT id, name__v FROM {cls.table_name} WHERE modified_date__v >= '{get_two_days_records()}'"
+        return f"SELECT id, name__v, modified_date__v FROM {cls.table_name} WHERE modified_date__v >= '{get_incremental_since(cls.__name__)}'"
 
     @classmethod
     def model_validate(cls, api_response: Dict[str, str], **kwargs) -> "Constant":
-        return cls(id=api_response["id"], name=api_response["name__v"])
+        return cls(id=api_response["id"], name=api_response["name__v"], modified_date=parse_vault_datetime(api_response.get("modified_date__v")))
 
     def __repr__(self) -> str:
         return f"{self.id}: {self.name}"
@@ -41,6 +43,44 @@ class BusinessProcessL3(Constant): table_name = "process_level_3__c"
 class BusinessProcessL4(Constant): table_name = "process_level_4__c"
 class BusinessProcessL5(Constant): table_name = "process_level_5__c"
 
+# Lookup category (veeva_data key and constants/<category>.json file name) -> table model
+LOOKUP_TABLES = {
+    "countries": Country,
+    "object_reference": ObjectReference,
+    "business_area_1": BusinessArea1,
+    "business_area_2": BusinessArea2,
+    "business_area_3": BusinessArea3,
+    "business_area_4": BusinessArea4,
+    "business_area_5": BusinessArea5,
+    "business_area_6": BusinessArea6,
+    "product_family": ProductFamily,
+    "product_variant": ProductVariant,
+    "material_group": MaterialGroup,
+    "substance_material": SubstanceMaterialEquipment,
+    "equipment": Equipment,
+    "equipment_type": EquipmentType,
+    "business_process_l1": BusinessProcessL1,
+    "business_process_l2": BusinessProcessL2,
+    "business_process_l3": BusinessProcessL3,
+    "business_process_l4": BusinessProcessL4,
+    "business_process_l5": BusinessProcessL5,
+}
+
+# DocumentMetadata relation attribute -> lookup category resolving its ids to names
+RELATIONS = {
+    "country": "countries",
+    **{f"owning_business_area_{i}": f"business_area_{i}" for i in range(1, 5)},
+    **{f"impacted_business_area_{i}": f"business_area_{i}" for i in range(1, 7)},
+    "product_family": "product_family",
+    "product_variant": "product_variant",
+    "material_group": "material_group",
+    "material": "substance_material",
+    "substance": "substance_material",
+    "equipment_nongvlms": "equipment",
+    "equipment_type": "equipment_type",
+    **{f"process_l{i}": f"business_process_l{i}" for i in range(1, 6)},
+}
+
 # SOP selector
 class SOPs(Constant):
     table_name = "documents"
@@ -1,14 +1,45 @@
 """Document metadata model"""
 from __future__ import annotations
+import sys
 from datetime import datetime
-from typing import Dict, List, Optional, Literal, Any
-from src.experiment import get_two_days_records
+from typing import Callable, Dict, Iterable, List, Optional, Literal, Any
+from src.watermarks import get_incremental_since, parse_vault_datetime
 from src.logging import SingletonLogger
 
 logger = SingletonLogger().get_logger()
 
+_IMPACTED_KEYS = tuple(f"impacted_business_area_{i}__c" for i in range(1, 7))
+_OWNING_KEYS = tuple(f"owning_business_area_{i}__c" for i in range(1, 5))
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _as_int(value: Any, default: Optional[int] = None) -> Optional[int]:
+    return int(value) if value else default
+
+
+def _intern(value: Any) -> Any:
+    # Low-cardinality values repeat across every row of a page; share one string object
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class DocumentMetadata:
     table_name = "documents"
+    # ALLVERSIONS loads hold tens of thousands of instances; slots drop the per-instance __dict__
+    __slots__ = (
+        "file_id", "name", "document_number", "document_status", "version_modified_date", "file_created_date",
+        "pages", "major_version", "minor_version", "language", "md5checksum", "country", "gxp_category",
+        "owning_business_area_1", "owning_business_area_2", "owning_business_area_3", "owning_business_area_4",
+        "impacted_business_area_1", "impacted_business_area_2", "impacted_business_area_3",
+        "impacted_business_area_4", "impacted_business_area_5", "impacted_business_area_6",
+        "product_family", "product_variant", "material", "substance", "material_group", "equipment_nongvlms",
+        "entities_gvlms", "equipment_type", "process_l1", "process_l2", "process_l3", "process_l4", "process_l5",
+        "status",
+    )
 
     def __init__(self, file_id: int, name: str, document_number: str, document_status: str, version_modified_date: datetime, file_created_date: Optional[datetime] = None,
                  pages: Optional[int] = None, major_version: Optional[int] = None, minor_version: Optional[int] = None,
@@ -63,7 +94,7 @@ class DocumentMetadata:
         self.status = status
 
     @classmethod
-    def get_query(cls, execution_type: Literal["Incremental", "Load"]) -> str:
+    def get_query(cls, execution_type: Literal["Incremental", "Load"], where: Optional[str] = None) -> str:
         base = (
             "SELECT id, name__v, file_created_date__v, version_modified_date__v, status__v, pages__v, "
             "major_version_number__v, minor_version_number__v, language__v, md5checksum__v, country__v, "
@@ -76,12 +107,14 @@ class DocumentMetadata:
             "AND (type__v IN ('Work Instruction','Standard Operating Procedure (SOP)','Standard','Form','Template','Guidance')) "
             "AND security__c = 'Open' "
         )
+        if where:
+            base += f" AND ({where})"
         if execution_type == "Incremental":
-            base += f" AND version_modified_date__v >= '{get_two_days_records()}'"
+            base += f" AND version_modified_date__v >= '{get_incremental_since(cls.__name__)}'"
         return base
 
     @classmethod
-    def get_query_single_document(cls, document_number: str) -> str:
+    def _latest_documents_query(cls) -> str:
         return (
             "SELECT id, name__v, file_created_date__v, version_modified_date__v, pages__v, status__v, major_version_number__v, "
             "minor_version_number__v, language__v, md5checksum__v, country__v, gxp_category__c, product_family__c, product_variant__c, "
@@ -90,43 +123,38 @@ class DocumentMetadata:
             "impacted_business_area_4__c, impacted_business_area_5__c, impacted_business_area_6__c, equipment_nongvlms__c, entities_gvlms__c, "
             "equipment_type__c, process_l1__c, process_l2__c, process_l3__c, process_l4__c, process_l5__c, document_number__v "
             "FROM documents WHERE (status__v  = 'Effective') AND latest_version__v = true AND security__c = 'Open' "
-            f"AND document_number__v = '{document_number}'"
         )
 
     @classmethod
-    def model_validate(cls, api_response: Dict[str, Any], **kwargs) -> "DocumentMetadata":
-        # Normalize impacted/owning fields into lists
-        def norm_field(name):
-            v = api_response.get(name)
-            if v is None:
-                return []
-            if isinstance(v, list):
-                return v
-            return [v]
-
-        impacted = [norm_field(f"impacted_business_area_{i}__c") for i in range(1, 7)]
-        owning = [norm_field(f"owning_business_area_{i}__c") for i in range(1, 5)]
-
-        def parse_dt(key):
-            val = api_response.get(key)
-            if not val:
-                return None
-            return datetime.strptime(val, "%Y-%m-%dT%H:%M:%S.%fZ")
+    def get_query_single_document(cls, document_number: str) -> str:
+        return cls._latest_documents_query() + f"AND document_number__v = '{document_number}'"
 
+    @classmethod
+    def get_query_documents(cls, document_numbers: Iterable[str]) -> str:
+        numbers = ", ".join("'" + n.replace("\\", "\\\\").replace("'", "\\'") + "'" for n in document_numbers)
+        return cls._latest_documents_query() + f"AND document_number__v IN ({numbers})"
+
+    @classmethod
+    def _from_row(cls, api_response: Dict[str, Any], intern: Callable[[Any], Any],
+                  parse_date: Callable[[Optional[str]], Optional[datetime]]) -> "DocumentMetadata":
+        get = api_response.get
+        # Relation ids repeat across rows just like the scalar codes
+        impacted = [[intern(v) for v in _as_list(get(key))] for key in _IMPACTED_KEYS]
+        owning = [[intern(v) for v in _as_list(get(key))] for key in _OWNING_KEYS]
         return cls(
             file_id=int(api_response["id"]),
-            name=api_response.get("name__v", ""),
-            document_number=api_response.get("document_number__v", ""),
-            document_status=api_response.get("status__v", ""),
-            file_created_date=parse_dt("file_created_date__v"),
-            version_modified_date=parse_dt("version_modified_date__v"),
-            pages=int(api_response.get("pages__v")) if api_response.get("pages__v") else None,
-            major_version=int(api_response.get("major_version_number__v")) if api_response.get("major_version_number__v") else None,
-            minor_version=int(api_response.get("minor_version_number__v")) if api_response.get("minor_version_number__v") else 0,
-            language=api_response.get("language__v"),
-            md5checksum=api_response.get("md5checksum__v"),
-            country=api_response.get("country__v"),
-            gxp_category=api_response.get("gxp_category__c"),
+            name=get("name__v", ""),
+            document_number=get("document_number__v", ""),
+            document_status=intern(get("status__v", "")),
+            file_created_date=parse_date(get("file_created_date__v")),
+            version_modified_date=parse_date(get("version_modified_date__v")),
+            pages=_as_int(get("pages__v")),
+            major_version=_as_int(get("major_version_number__v")),
+            minor_version=_as_int(get("minor_version_number__v"), 0),
+            language=intern(get("language__v")),
+            md5checksum=get("md5checksum__v"),
+            country=intern(get("country__v")),
+            gxp_category=intern(get("gxp_category__c")),
             owning_business_area_1=owning[0],
             owning_business_area_2=owning[1],
             owning_business_area_3=owning[2],
@@ -137,16 +165,43 @@ class DocumentMetadata:
             impacted_business_area_4=impacted[3],
             impacted_business_area_5=impacted[4],
             impacted_business_area_6=impacted[5],
-            equipment_nongvlms=api_response.get("equipment_nongvlms__c"),
-            entities_gvlms=api_response.get("entities_gvlms__c"),
-            equipment_type=api_response.get("equipment_type__c"),
-            process_l1=api_response.get("process_l1__c"),
-            process_l2=api_response.get("process_l2__c"),
-            process_l3=api_response.get("process_l3__c"),
-            process_l4=api_response.get("process_l4__c"),
-            process_l5=api_response.get("process_l5__c"),
+            equipment_nongvlms=get("equipment_nongvlms__c"),
+            entities_gvlms=get("entities_gvlms__c"),
+            equipment_type=get("equipment_type__c"),
+            process_l1=get("process_l1__c"),
+            process_l2=get("process_l2__c"),
+            process_l3=get("process_l3__c"),
+            process_l4=get("process_l4__c"),
+            process_l5=get("process_l5__c"),
         )
 
+    @classmethod
+    def model_validate(cls, api_response: Dict[str, Any], **kwargs) -> "DocumentMetadata":
+        return cls._from_row(api_response, _intern, parse_vault_datetime)
+
+    @classmethod
+    def model_validate_many(cls, api_responses: Iterable[Dict[str, Any]]) -> List["DocumentMetadata"]:
+        """Parse a whole VQL page, sharing one intern table and one timestamp cache across its rows.
+
+        Both are dropped with the page, so values seen once do not accumulate in the
+        process-wide intern table, and a timestamp repeated across rows (bulk
+        migrations, ALLVERSIONS) is parsed once and shared.
+        """
+        strings: Dict[str, str] = {}
+        dates: Dict[Optional[str], Optional[datetime]] = {}
+
+        def intern(value: Any) -> Any:
+            return strings.setdefault(value, value) if isinstance(value, str) else value
+
+        def parse_date(value: Optional[str]) -> Optional[datetime]:
+            parsed = dates.get(value)
+            if parsed is None and value not in dates:
+                parsed = dates[value] = parse_vault_datetime(value)
+            return parsed
+
+        from_row = cls._from_row
+        return [from_row(api_response, intern, parse_date) for api_response in api_responses]
+
     def get_document_id(self) -> str:
         return '{"id": "' + str(self.file_id) + '"}'
 
@@ -0,0 +1,16 @@
+from enum import Enum
+
+class DocumentStatus(str, Enum):
+    DOWNLOADING = "DOWNLOADING"
+    OK = "OK"
+    DELETED = "DELETED"
+
+# Target status -> statuses an item must currently be in; None means any existing item
+REQUIRED_FROM = {
+    DocumentStatus.OK: (DocumentStatus.DOWNLOADING,),
+    DocumentStatus.DOWNLOADING: (DocumentStatus.OK, DocumentStatus.DOWNLOADING),
+    DocumentStatus.DELETED: None,
+}
+
+# Item attribute recording which content version questions were generated for; set by the generate phase, not Vault
+QUESTIONS_VERSION = "questions_version"
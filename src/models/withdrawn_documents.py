@@ -1,25 +1,28 @@
-from typing import Dict, Literal
-from src.experiment import get_two_days_records
+from datetime import datetime
+from typing import Dict, Literal, Optional
+from src.watermarks import get_incremental_since, parse_vault_datetime
 
 class WithdrawnDocument:
     table_name = "documents"
 
-    def __init__(self, file_id: str, name: str):
+    def __init__(self, file_id: str, name: str, version_modified_date: Optional[datetime] = None):
         self.file_id = file_id
         self.name = name
+        self.version_modified_date = version_modified_date
 
     @classmethod
     def get_query(cls, _: Literal["Incremental", "Load"]) -> str:
         return (
-            "SELECT id, name__v FROM documents WHERE (status__v = 'Withdrawn' OR status__v = 'Superseded') "
+            "SELECT id, name__v, version_modified_date__v FROM documents WHERE (status__v = 'Withdrawn' OR status__v = 'Superseded') "
             "AND (type__v IN ('Work Instruction','Standard Operating Procedure (SOP)','Standard','Form','Template','Guidance')) "
             "AND latest_version__v = true AND security__c = 'Open' "
-            f"AND version_modified_date__v >= '{get_two_days_records()}'"
+            f"AND version_modified_date__v >= '{get_incremental_since(cls.__name__)}'"
         )
 
     @classmethod
     def model_validate(cls, api_response: Dict[str, str], **kwargs) -> "WithdrawnDocument":
-        return cls(file_id=api_response["id"], name=api_response["name__v"])
+        return cls(file_id=api_response["id"], name=api_response["name__v"],
+                   version_modified_date=parse_vault_datetime(api_response.get("version_modified_date__v")))
 
     def __repr__(self) -> str:
         return f"{self.file_id}: {self.name}"
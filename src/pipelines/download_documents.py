@@ -2,10 +2,13 @@
 from __future__ import annotations
 import json
 import os
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 from datetime import datetime
+from src.concurrency import AdaptiveConcurrency, map_concurrently
+from src.connectors.export_poller import poll_export_jobs
 from src.logging import SingletonLogger
-from src.utils import initialize_services
+from src.utils import initialize_services, load_pipeline_config
 
 logger = SingletonLogger().get_logger()
 
@@ -26,15 +29,24 @@ def filter_metadata(d: Dict[str, Any]) -> Dict[str, str]:
     logger.info("[DEBUG] Filtered metadata for S3 upload: %s", filtered)
     return filtered
 
-def process_document(doc: Any, veeva, dynamodb, s3, bedrock) -> None:
-    metadata = dynamodb.get_document(str(doc.id))
+def get_s3_folder(metadata: Dict[str, Any]) -> str:
+    site = metadata["site"]
+    document_type = metadata.get("document_type", "").lower()
+    site = site.replace(" ", "_").replace("?", "").replace("&", "").replace("/", "_")
+    document_type = document_type.replace(" ", "_").replace("?", "").replace("&", "").replace("/", "_")
+    return f"kb_documents/{site}/{document_type}"
+
+def process_document(doc: Any, veeva, dynamodb, s3, bedrock, metadata: Dict[str, Any] | None = None) -> bool:
+    """Upload one exported document; False when it was skipped without uploading."""
+    if metadata is None:
+        metadata = dynamodb.get_document(str(doc.id))
     if not metadata:
         logger.warning("No DynamoDB entry for doc %s. Skipping.", doc.id)
-        return
+        return False
     current_status = metadata.get("status", "UNKNOWN")
     if current_status != "DOWNLOADING":
         logger.info("Skipping doc %s: Status is %s", doc.id, current_status)
-        return
+        return False
 
     # version check
     veeva_major_version = getattr(doc, "major_version_number", None) or (doc.__dict__.get("data", {}) or {}).get("major_version_number__v")
@@ -42,40 +54,79 @@ def process_document(doc: Any, veeva, dynamodb, s3, bedrock) -> None:
     if veeva_major_version is not None and str(veeva_major_version) != str(db_major_version):
         logger.warning("Version mismatch for doc %s: veeva=%s db=%s", doc.id, veeva_major_version, db_major_version)
 
-    logger.info("Downloading content for doc %s", doc.id)
-    doc = veeva.download_item_content(doc)
-
-    site = metadata["site"]
-    document_type = metadata.get("document_type", "").lower()
-    site = site.replace(" ", "_").replace("?", "").replace("&", "").replace("/", "_")
-    document_type = document_type.replace(" ", "_").replace("?", "").replace("&", "").replace("/", "_")
+    s3_path = get_s3_folder(metadata)
 
-    s3_path = f"kb_documents/{site}/{document_type}"
-    logger.info("Uploading doc %s to S3 at %s", doc.id, s3_path)
-    doc.s3_path = s3.upload_document(s3_path, doc)
+    pipeline_config = load_pipeline_config().get("pipeline", {})
+    if pipeline_config.get("stream_uploads", False):
+        # Vault response is piped straight into S3 without touching local disk
+        logger.info("Streaming doc %s from Vault to S3 at %s", doc.id, s3_path)
+        content = veeva.iter_item_content(doc)
+        doc.file = f"{doc.id}.pdf"
+        # md5checksum__v is the source file's checksum, so only a source export can be checked against it
+        expected_md5 = metadata.get("md5") if pipeline_config.get("verify_md5", True) and veeva.export_source else None
+        doc.s3_path = s3.upload_stream(s3_path, doc.file, content, expected_md5=expected_md5)
+    else:
+        logger.info("Downloading content for doc %s", doc.id)
+        doc = veeva.download_item_content(doc)
+        logger.info("Uploading doc %s to S3 at %s", doc.id, s3_path)
+        doc.s3_path = s3.upload_document(s3_path, doc)
 
     metadata_s3 = {"metadataAttributes": filter_metadata(metadata)}
     s3.put_object(json.dumps(metadata_s3), s3_path, f"{doc.file}.metadata.json")
 
-    metadata["status"] = "OK"
-    dynamodb.update_document(metadata)
+    # Conditional DOWNLOADING -> OK; only the status attribute is written
+    dynamodb.mark_downloaded(str(doc.id))
     logger.info("Updated status to OK for doc %s in DynamoDB.", doc.id)
+    return True
 
 
-def download_documents(job_id: str, experiment_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    veeva, dynamodb, _, s3, email, bedrock, _, _, _, _ = initialize_services()
+def download_export_documents(export_documents: Iterable[Any], veeva, dynamodb, s3, bedrock,
+                              on_success: Callable[[Any], None] | None = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    concurrency = AdaptiveConcurrency(**load_pipeline_config().get("pipeline", {}).get("download_concurrency", {}))
+    results = []
+    errors = []
+    start = time.perf_counter()
+    export_documents = list(export_documents)
+    existing_metadata = dynamodb.batch_get_documents(str(d.id) for d in export_documents)
+    process = lambda d: process_document(d, veeva, dynamodb, s3, bedrock, existing_metadata.get(str(d.id), {}))
+    skipped = 0
+    for doc, uploaded, doc_err in map_concurrently(process, export_documents, concurrency, "download"):
+        if doc_err is not None:
+            logger.error("Download failed for doc %s: %s", getattr(doc, "id", "unknown"), str(doc_err))
+            errors.append({"step": "Download document failed", "description": f"Document ID: {getattr(doc,'id','unknown')}", "status": "FAILED", "details": str(doc_err)})
+        elif uploaded:
+            results.append({"step": "Downloaded document", "description": f"Document ID: {doc.id}", "status": "OK"})
+            if on_success is not None:
+                on_success(doc)
+        else:
+            skipped += 1
+    logger.info("Processed %d documents (%d failed, %d skipped) in %.2fs", len(results) + len(errors) + skipped, len(errors), skipped,
+                time.perf_counter() - start)
+    return results, errors
+
+
+def download_jobs(job_ids: List[str], experiment_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Poll all export jobs together and download each job's documents as soon as it completes."""
+    veeva, dynamodb, _, s3, email, bedrock, _, _, _, config = initialize_services()
     results = []
     errors = []
     try:
-        os.environ["experiment_id"] = f"{experiment_id} - {str(job_id)}"
-        export_documents = veeva.retrieve_export_documents_results(job_id)
-        for doc in export_documents:
-            try:
-                process_document(doc, veeva, dynamodb, s3, bedrock)
-                results.append({"step": "Downloaded document", "description": f"Document ID: {doc.id}", "status": "OK"})
-            except Exception as doc_err:
-                errors.append({"step": "Download document failed", "description": f"Document ID: {getattr(doc,'id','unknown')}", "status": "FAILED", "details": str(doc_err)})
+        poll_options = config.get("pipeline", {}).get("export_poller", {})
+        for job_id, export_documents, job_err in poll_export_jobs(veeva, job_ids, **poll_options):
+            os.environ["experiment_id"] = f"{experiment_id} - {str(job_id)}"
+            if job_err is not None:
+                errors.append({"step": "Download job failed", "description": f"Job ID: {job_id}", "status": "FAILED", "details": str(job_err)})
+                continue
+            doc_results, doc_errors = download_export_documents(export_documents, veeva, dynamodb, s3, bedrock)
+            results.extend(doc_results)
+            errors.extend(doc_errors)
+        dynamodb.log_stats()
+        veeva.log_stats()
     except Exception as e:
         logger.error("An error occurred: %s", str(e), exc_info=True)
-        errors.append({"step": "Download job failed", "description": f"Job ID: {job_id}", "status": "FAILED", "details": str(e)})
+        errors.append({"step": "Download jobs failed", "description": f"Job IDs: {', '.join(map(str, job_ids))}", "status": "FAILED", "details": str(e)})
     return results, errors
+
+
+def download_documents(job_id: str, experiment_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    return download_jobs([job_id], experiment_id)
@@ -1,55 +1,33 @@
 """High-level retrieval & export orchestration (planning)"""
 from __future__ import annotations
-import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Any, Dict, List
 from tqdm import tqdm
+from src.connectors.export_poller import poll_export_jobs
 from src.logging import SingletonLogger
-from src.models import (
-    BusinessArea1, BusinessArea2, BusinessArea3, BusinessArea4, BusinessArea5, BusinessArea6,
-    BusinessProcessL1, BusinessProcessL2, BusinessProcessL3, BusinessProcessL4, BusinessProcessL5,
-    Country, DocumentMetadata, Equipment, EquipmentType, MaterialGroup, ObjectReference,
-    ProductFamily, ProductVariant, SubstanceMaterialEquipment,
-)
-from src.utils import initialize_services
+from src.lookups import RelationResolver, get_lookup_cache, load_lookup_tables
+from src.models import DocumentMetadata
+from src.utils import initialize_services, load_pipeline_config
 
 logger = SingletonLogger().get_logger()
 
 @lru_cache(maxsize=None)
 def get_veeva_data(veeva, s3) -> Dict[str, Dict[str, str]]:
-    return {
-        "countries": s3.get_json("constants", "countries.json") | {c.id: c.name for c in veeva.submit_vql_query(Country)},
-        "object_reference": s3.get_json("constants", "object_reference.json") | {c.id: c.name for c in veeva.submit_vql_query(ObjectReference)},
-        "business_area_1": s3.get_json("constants", "business_area_1.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea1)},
-        "business_area_2": s3.get_json("constants", "business_area_2.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea2)},
-        "business_area_3": s3.get_json("constants", "business_area_3.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea3)},
-        "business_area_4": s3.get_json("constants", "business_area_4.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea4)},
-        "business_area_5": s3.get_json("constants", "business_area_5.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea5)},
-        "business_area_6": s3.get_json("constants", "business_area_6.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessArea6)},
-        "product_family": s3.get_json("constants", "product_family.json") | {c.id: c.name for c in veeva.submit_vql_query(ProductFamily)},
-        "product_variant": s3.get_json("constants", "product_variant.json") | {c.id: c.name for c in veeva.submit_vql_query(ProductVariant)},
-        "material_group": s3.get_json("constants", "material_group.json") | {c.id: c.name for c in veeva.submit_vql_query(MaterialGroup)},
-        "substance_material": s3.get_json("constants", "substance_material.json") | {c.id: c.name for c in veeva.submit_vql_query(SubstanceMaterialEquipment)},
-        "equipment": s3.get_json("constants", "equipment.json") | {c.id: c.name for c in veeva.submit_vql_query(Equipment)},
-        "equipment_type": s3.get_json("constants", "equipment_type.json") | {c.id: c.name for c in veeva.submit_vql_query(EquipmentType)},
-        "business_process_l1": s3.get_json("constants", "business_process_l1.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessProcessL1)},
-        "business_process_l2": s3.get_json("constants", "business_process_l2.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessProcessL2)},
-        "business_process_l3": s3.get_json("constants", "business_process_l3.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessProcessL3)},
-        "business_process_l4": s3.get_json("constants", "business_process_l4.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessProcessL4)},
-        "business_process_l5": s3.get_json("constants", "business_process_l5.json") | {c.id: c.name for c in veeva.submit_vql_query(BusinessProcessL5)},
-    }
+    workers = load_pipeline_config().get("pipeline", {}).get("lookup_workers", 8)
+    return load_lookup_tables(veeva, s3, max_workers=workers, cache=get_lookup_cache(s3))
 
 def update_s3_json_files(s3, veeva_data: Dict[str, Dict[str, str]]) -> None:
     logger.info("Starting update of S3 JSON files with latest Veeva data")
+    cache = get_lookup_cache(s3)
     for category, data in veeva_data.items():
         file_name = f"{category}.json"
         folder_name = "constants"
         try:
-            json_content = json.dumps(data, indent=2)
-            s3.put_object(json_content, folder_name, file_name)
-            logger.info("Successfully updated S3 file: %s/%s", folder_name, file_name)
+            if cache.put(category, data):
+                logger.info("Successfully updated S3 file: %s/%s", folder_name, file_name)
         except Exception as e:
             logger.error("Error updating S3 file %s/%s: %s", folder_name, file_name, str(e))
     logger.info("Completed update of S3 JSON files")
@@ -60,10 +38,19 @@ def compute_document_type(document_number: str) -> str:
     return matches[0] if matches else ""
 
 def process_documents(veeva, s3, veeva_data, documents: List[str]) -> List[DocumentMetadata]:
-    docs = veeva.submit_vql_query(DocumentMetadata)
-    for doc in docs:
-        doc.rename_relations(**veeva_data)
-    filtered_docs = [doc for doc in docs if doc.document_number in documents]
+    # Chunked document_number IN (...) queries instead of a full-corpus scan
+    pipeline_config = load_pipeline_config().get("pipeline", {})
+    batch_size = pipeline_config.get("sop_query_batch_size", 50)
+    wanted = set(documents)
+    numbers = sorted(wanted)
+    chunks = [numbers[i:i+batch_size] for i in range(0, len(numbers), batch_size)]
+    with ThreadPoolExecutor(max_workers=pipeline_config.get("sop_query_workers", 4), thread_name_prefix="sop-query") as executor:
+        pages = executor.map(lambda chunk: veeva.submit_vql_query(DocumentMetadata, query=DocumentMetadata.get_query_documents(chunk)), chunks)
+        filtered_docs = [doc for page in pages for doc in page if doc.document_number in wanted]
+    RelationResolver(veeva_data).resolve_many(filtered_docs)
+    missing = wanted.difference(doc.document_number for doc in filtered_docs)
+    if missing:
+        logger.warning("No effective open document found for: %s", ", ".join(sorted(missing)))
     logger.info("A total of %d have been detected.", len(filtered_docs))
     return filtered_docs
 
@@ -81,7 +68,7 @@ def download_document(doc, veeva, s3) -> None:
 
 def retrieve_documents(documents: List[str]) -> List[str]:
     list_of_documents = {"Experiment ID": os.getenv("experiment_id", "env")}
-    veeva, _, sns, s3, email, _, _, _, _ = initialize_services()
+    veeva, _, sns, s3, email, _, _, _, _, _ = initialize_services()
     try:
         veeva_data = get_veeva_data(veeva, s3)
         update_s3_json_files(s3, veeva_data)
@@ -89,10 +76,12 @@ def retrieve_documents(documents: List[str]) -> List[str]:
         list_of_documents["nº Checked Documents"] = len(download_files_list)
         job_ids = submit_export_jobs(veeva, download_files_list)
         list_of_documents["job_ids"] = "-".join(job_ids) if job_ids else ""
-        for job_id in job_ids:
-            export_documents = veeva.retrieve_export_documents_results(job_id)
+        for job_id, export_documents, job_err in poll_export_jobs(veeva, job_ids):
+            if job_err is not None:
+                raise job_err
             for doc in export_documents:
                 download_document(doc, veeva, s3)
+        veeva.log_stats()
         return job_ids
     except Exception as e:
         logger.error("An error occurred: %s", str(e), exc_info=True)
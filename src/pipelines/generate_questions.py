@@ -1,16 +1,22 @@
 """Generate LLM-based questions for a document and persist them."""
 from __future__ import annotations
+import time
 import uuid
 import os
+from typing import Any, Dict, Iterator, List, Tuple
+from src.concurrency import AdaptiveConcurrency, map_concurrently
 from src.docling import DoclingInterface
+from src.exceptions.exceptions import StatusTransitionError
 from src.logging import SingletonLogger
+from src.models.document_status import QUESTIONS_VERSION, DocumentStatus
+from src.pipelines.download_documents import get_s3_folder
 from src.utils import initialize_services
 
 logger = SingletonLogger().get_logger()
 
-def generate_questions(folder_name: str, file_name: str) -> None:
-    list_of_documents = {"Experiment ID": os.getenv("experiment_id", "test")}
-    _, file_ingestion, _, s3, email, _, dynamodb, llm, _ = initialize_services()
+def generate_questions(folder_name: str, file_name: str) -> bool:
+    # Failures are logged and reported once per run by generate_all_questions
+    _, file_ingestion, _, s3, _, _, dynamodb, llm, _, _ = initialize_services()
     local_file_path = f"tmp/{file_name}"
     try:
         s3.download_document(folder_name, file_name, local_file_path)
@@ -21,13 +27,65 @@ def generate_questions(folder_name: str, file_name: str) -> None:
             f.write(md_text)
         prompt = f"Generate a set of questions that are very related with the following document: {md_text}. I want at least 5 related questions."
         questions = llm.get_with_structured_output(prompt, list)["questions"] if hasattr(llm, "get_with_structured_output") else []
-        for q in questions:
-            file = file_ingestion.get_document(file_name.split(".")[0])
-            q["Expected"] = file.get("document_number") if file else ""
-            q["Generator"] = "AI"
-            q["question_id"] = str(uuid.uuid4())
-            dynamodb.put_item(q)
+        with dynamodb.batch_writer() as writer:
+            for q in questions:
+                file = file_ingestion.get_document(file_name.split(".")[0])
+                q["Expected"] = file.get("document_number") if file else ""
+                q["Generator"] = "AI"
+                q["question_id"] = str(uuid.uuid4())
+                writer.put(q)
+        return True
     except Exception as e:
-        logger.error("An error occurred: %s", str(e), exc_info=True)
-        list_of_documents["error"] = str(e)
-        email.format_email("[FAILURE]. An error was found.", list_of_documents)
+        logger.error("Question generation failed for %s: %s", file_name, str(e), exc_info=True)
+        return False
+
+def content_version(item: Dict[str, Any]) -> str:
+    return f"{item.get('major_version')}.{item.get('minor_version')}:{item.get('md5') or ''}"
+
+def iter_generation_candidates(file_ingestion, only_new: bool) -> Iterator[Dict[str, Any]]:
+    # Streams status OK items; with only_new, skips documents whose current content already has questions
+    for item in file_ingestion.query_by_status("OK"):
+        if only_new and item.get(QUESTIONS_VERSION) == content_version(item):
+            continue
+        yield item
+
+def mark_questions_generated(file_ingestion, item: Dict[str, Any]) -> None:
+    # Recorded per document, so a failure elsewhere never makes the next run regenerate this one.
+    # Only stamps content that is still stored as queried; status is never written.
+    expected = {"status": DocumentStatus.OK, **{k: item.get(k) for k in ("md5", "major_version", "minor_version")}}
+    try:
+        file_ingestion.update_if(item["file_id"], expected, **{QUESTIONS_VERSION: content_version(item)})
+    except StatusTransitionError as e:
+        logger.warning("Not marking questions for doc %s: %s", item["file_id"], str(e))
+
+def generate_all_questions(experiment_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Generate questions for every eligible document over a bounded worker pool."""
+    _, file_ingestion, _, _, email, _, _, _, _, config = initialize_services()
+    generate_config = config.get("pipeline", {}).get("generate", {})
+    concurrency = AdaptiveConcurrency(**generate_config.get("concurrency", {"initial": 2, "max_limit": 4}))
+    results = []
+    errors = []
+    start = time.perf_counter()
+
+    def run(item: Dict[str, Any]) -> bool:
+        if not generate_questions(get_s3_folder(item), f"{item['file_id']}.pdf"):
+            raise RuntimeError(f"Question generation failed for {item['file_id']}")
+        mark_questions_generated(file_ingestion, item)
+        return True
+
+    candidates = iter_generation_candidates(file_ingestion, generate_config.get("only_new", True))
+    for item, _, err in map_concurrently(run, candidates, concurrency, "generate"):
+        if err is None:
+            results.append({"step": "Generated questions", "description": f"Document ID: {item['file_id']}", "status": "OK"})
+        else:
+            errors.append({"step": "Generate questions failed", "description": f"Document ID: {item.get('file_id', 'unknown')}", "status": "FAILED", "details": str(err)})
+        done = len(results) + len(errors)
+        if done % 25 == 0:
+            logger.info("Generated questions for %d documents (%.2f docs/min)", done, done / (time.perf_counter() - start) * 60)
+    elapsed = time.perf_counter() - start
+    processed = len(results) + len(errors)
+    logger.info("Question generation finished: %d documents (%d failed) in %.1fs (%.2f docs/min)",
+                processed, len(errors), elapsed, processed / elapsed * 60 if elapsed else 0.0)
+    email.format_email(f"Question Generation [{experiment_id}] - {'SUCCESS' if not errors else 'PARTIAL FAILURE'}",
+                       {"Experiment ID": experiment_id, "processed": processed, "failed": len(errors), "errors": errors})
+    return results, errors
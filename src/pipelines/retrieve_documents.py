@@ -4,80 +4,163 @@ import datetime
 import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Dict, List, Literal
 from collections import Counter
 
+from src.exceptions.exceptions import StatusTransitionError
 from src.logging import SingletonLogger
 from src.connectors import S3, SNS, DynamoDB, Email, Veeva, FileIngestion
-from src.models import (Country, DocumentMetadata, WithdrawnDocument, BusinessArea1, BusinessArea2, BusinessArea3, BusinessArea4, BusinessArea5, BusinessArea6, BusinessProcessL1, BusinessProcessL2, BusinessProcessL3, BusinessProcessL4, BusinessProcessL5, Equipment, EquipmentType, MaterialGroup, ObjectReference, ProductFamily, ProductVariant, SubstanceMaterialEquipment)
-from src.utils import initialize_services, get_impacted_business_areas_incremental, get_impacted_business_areas_load
+from src.lookups import RelationResolver, get_lookup_cache, load_lookup_tables
+from src.models import DocumentMetadata, WithdrawnDocument
+from src.models.document_status import QUESTIONS_VERSION
+from src.pipelines.download_documents import filter_metadata, get_s3_folder
+from src.site_matcher import SiteMatcher, site_vql_filters
+from src.utils import initialize_services, load_pipeline_config, get_impacted_business_areas_incremental, get_impacted_business_areas_load
+from src.watermarks import advance_watermark, commit_watermarks
 
 logger = SingletonLogger().get_logger()
 
 @lru_cache(maxsize=None)
 def get_veeva_data(veeva: Veeva, s3: S3):
-    return {
-        "countries": s3.get_json("constants", "countries.json") | {c.id: c.name for c in veeva.submit_vql_query(Country)},
-        # ... same pattern for other lookup types
-    }
+    workers = load_pipeline_config().get("pipeline", {}).get("lookup_workers", 8)
+    return load_lookup_tables(veeva, s3, max_workers=workers, cache=get_lookup_cache(s3))
 
 def update_s3_json_files(s3: S3, veeva_data: Dict[str, Dict[str, str]]):
+    cache = get_lookup_cache(s3)
     for category, data in veeva_data.items():
-        s3.put_object(json.dumps(data, indent=2), "constants", f"{category}.json")
+        cache.put(category, data)
 
 def compute_document_type(document_number: str) -> str:
     full_pattern = r"\b(?:SOP|BDR|WI|SPEC|REP|GUID|FORM|STND|TMP)\b"
     results = re.findall(full_pattern, document_number or "")
     return results[0] if len(results) else ""
 
-def process_documents(veeva: Veeva, dynamodb: DynamoDB, veeva_data: Dict[str, Dict[str, str]], execution_type: Literal["Incremental", "Load"]):
-    logger.info("Fetching business documents from Veeva...")
-    docs = veeva.submit_vql_query(DocumentMetadata, execution_type)
-    for doc in docs:
-        doc.rename_relations(**veeva_data)
+# Attributes identifying the exported file; always taken from Vault, even when a Load keeps the stored item
+CONTENT_KEYS = ("md5", "major_version", "minor_version")
+
+def is_content_unchanged(existing: Dict, metadata: Dict) -> bool:
+    """True when the stored PDF is byte-identical to Vault's and already sits at the target S3 prefix."""
+    if existing.get("status") != "OK" or not existing.get("md5"):
+        return False
+    return all(existing.get(k) == metadata.get(k) for k in CONTENT_KEYS + ("site", "document_type"))
+
+def rewrite_metadata_sidecar(s3: S3, metadata: Dict) -> None:
+    metadata_s3 = {"metadataAttributes": filter_metadata(metadata)}
+    s3.put_object(json.dumps(metadata_s3), get_s3_folder(metadata), f"{metadata['file_id']}.pdf.metadata.json")
+
+def get_site_queries(veeva_data: Dict[str, Dict[str, str]], impacted_business_areas: Dict[str, List[List[str]]],
+                     execution_type: Literal["Incremental", "Load"]) -> Dict[str, List[str]]:
+    """Document VQL queries to run, each with the sites it pre-selects candidates for."""
+    if not load_pipeline_config().get("pipeline", {}).get("push_site_filters", True):
+        return {DocumentMetadata.get_query(execution_type): list(impacted_business_areas)}
+    filters = site_vql_filters(impacted_business_areas, veeva_data)
+    return {DocumentMetadata.get_query(execution_type, where): sites for where, sites in filters.items()}
+
+def fetch_site_documents(veeva: Veeva, veeva_data: Dict[str, Dict[str, str]], impacted_business_areas: Dict[str, List[List[str]]],
+                         execution_type: Literal["Incremental", "Load"]) -> List[DocumentMetadata]:
+    """Query only documents that can match a configured site, one VQL query per distinct site filter."""
+    queries = get_site_queries(veeva_data, impacted_business_areas, execution_type)
+    docs = {}
+    workers = load_pipeline_config().get("pipeline", {}).get("site_query_workers", 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="site-query") as executor:
+        futures = {query: executor.submit(veeva.submit_vql_query, DocumentMetadata, execution_type, query) for query in queries}
+        for query, future in futures.items():
+            rows = future.result()
+            logger.info("Fetched %d documents for sites %s", len(rows), ", ".join(queries[query]))
+            # Sites overlap, and ALLVERSIONS repeats ids across versions
+            for doc in rows:
+                docs.setdefault(document_version_key(doc), doc)
+    return list(docs.values())
+
+def document_version_key(doc: DocumentMetadata) -> tuple:
+    return doc.file_id, doc.major_version, doc.minor_version
+
+def get_impacted_business_areas(execution_type: Literal["Incremental", "Load"]) -> Dict[str, List[List[str]]]:
     if execution_type == "Incremental":
-        impacted_business_areas = get_impacted_business_areas_incremental()
-    else:
-        impacted_business_areas = get_impacted_business_areas_load()
+        return get_impacted_business_areas_incremental()
+    return get_impacted_business_areas_load()
 
+def plan_documents(dynamodb: DynamoDB, s3: S3, docs: List[DocumentMetadata], site_matcher: SiteMatcher,
+                   execution_type: Literal["Incremental", "Load"]):
+    """Match resolved documents to sites, record them in DynamoDB and return those that need exporting."""
     download_files_list = []
     list_of_documents = {}
+    matched_docs = []
     for doc in docs:
-        # site detection
-        def find_matching_key(doc, impacted_business_areas):
-            for key, value in impacted_business_areas.items():
-                if DocumentMetadata.filter_by_impacted_business_area(doc, value):
-                    logger.info("Matched doc %s to site %s", doc.file_id, key)
-                    return key
-            return None
-
-        matching_key = find_matching_key(doc, impacted_business_areas)
+        matching_key = site_matcher.match(doc)
         if matching_key is None:
             logger.info("Skipping doc %s: No site match found.", doc.file_id)
             continue
+        logger.info("Matched doc %s to site %s", doc.file_id, matching_key)
+        matched_docs.append((doc, matching_key))
 
-        metadata = dynamodb.get_document(str(doc.file_id))
-        action = "CREATE" if metadata is None else "UPDATE"
-        list_of_documents[doc.file_id] = action
+    # One BatchGetItem round-trip per 100 documents instead of one GetItem each
+    existing_metadata = dynamodb.batch_get_documents(str(doc.file_id) for doc, _ in matched_docs)
+    with dynamodb.batch_writer(overwrite_by_pkeys=["file_id"]) as writer:
+        for doc, matching_key in matched_docs:
+            existing = existing_metadata.get(str(doc.file_id))
+            action = "CREATE" if existing is None else "UPDATE"
 
-        if execution_type == "Incremental" and action == "UPDATE":
-            try:
-                dynamodb.delete_document(metadata)
-            except Exception as e:
-                logger.error("Error preparing update for doc %s: %s", doc.file_id, str(e))
-            metadata = doc.model_dump()
-        else:
-            metadata = metadata or doc.model_dump()
+            if execution_type == "Incremental" and action == "UPDATE":
+                metadata = doc.model_dump()
+            elif existing:
+                metadata = dict(existing)
+                dump = doc.model_dump()
+                metadata.update({k: dump[k] for k in CONTENT_KEYS})
+            else:
+                metadata = doc.model_dump()
 
-        metadata["site"] = matching_key
-        metadata["document_type"] = compute_document_type(metadata.get("document_number", ""))
-        metadata["status"] = "DOWNLOADING"
-        dynamodb.update_document(metadata)
-        download_files_list.append(doc)
+            metadata["site"] = matching_key
+            metadata["document_type"] = compute_document_type(metadata.get("document_number", ""))
+            if existing is None:
+                metadata["status"] = "DOWNLOADING"
+                writer.put(metadata)
+                list_of_documents[doc.file_id] = action
+                download_files_list.append(doc)
+                continue
+
+            # Conditional UpdateItem writing only the attributes that changed
+            changed = {k: v for k, v in metadata.items() if existing.get(k) != v}
+            if execution_type == "Incremental":
+                changed.update({k: None for k in existing if k not in metadata and k != QUESTIONS_VERSION})
+            changed.pop("status", None)
+            if is_content_unchanged(existing, metadata):
+                # Same checksum and version: skip export, download and upload
+                if not changed:
+                    logger.info("Skipping doc %s: content and metadata unchanged", doc.file_id)
+                    list_of_documents[doc.file_id] = "UNCHANGED"
+                    continue
+                try:
+                    dynamodb.refresh_metadata(str(doc.file_id), **changed)
+                    rewrite_metadata_sidecar(s3, {k: v for k, v in {**existing, **changed}.items() if v is not None})
+                    logger.info("Content unchanged for doc %s; rewrote metadata only", doc.file_id)
+                    list_of_documents[doc.file_id] = "METADATA"
+                    continue
+                except StatusTransitionError as e:
+                    logger.warning("Metadata refresh failed for doc %s (%s); re-exporting", doc.file_id, str(e))
+
+            metadata["status"] = "DOWNLOADING"
+            try:
+                dynamodb.mark_downloading(str(doc.file_id), **changed)
+            except StatusTransitionError as e:
+                logger.warning("Status transition failed for doc %s (%s); rewriting item", doc.file_id, str(e))
+                writer.put(metadata)
+            list_of_documents[doc.file_id] = action
+            download_files_list.append(doc)
 
     return download_files_list, list_of_documents
 
+def process_documents(veeva: Veeva, dynamodb: DynamoDB, veeva_data: Dict[str, Dict[str, str]], execution_type: Literal["Incremental", "Load"], s3: S3):
+    impacted_business_areas = get_impacted_business_areas(execution_type)
+    logger.info("Fetching business documents from Veeva...")
+    docs = fetch_site_documents(veeva, veeva_data, impacted_business_areas, execution_type)
+    advance_watermark(DocumentMetadata.__name__, (doc.version_modified_date for doc in docs))
+    RelationResolver(veeva_data).resolve_many(docs)
+    # site detection; compiled once per run instead of scanning every site per document
+    return plan_documents(dynamodb, s3, docs, SiteMatcher(impacted_business_areas, veeva_data), execution_type)
+
 def submit_export_jobs(veeva: Veeva, sns: SNS, download_files_list: List[DocumentMetadata]) -> List[str]:
     chunked_list = [download_files_list[i:i+100] for i in range(0, len(download_files_list), 100)]
     job_ids = []
@@ -88,31 +171,44 @@ def submit_export_jobs(veeva: Veeva, sns: SNS, download_files_list: List[Documen
 
 def delete_withdrawn_documents(veeva: Veeva, dynamodb: DynamoDB, s3: S3):
     delete_documents = veeva.submit_vql_query(WithdrawnDocument)
+    advance_watermark(WithdrawnDocument.__name__, (doc.version_modified_date for doc in delete_documents))
     deleted_docs = {}
+    existing_metadata = dynamodb.batch_get_documents(str(doc.file_id) for doc in delete_documents)
+    withdrawn = []
     for doc in delete_documents:
-        metadata = dynamodb.get_document(str(doc.file_id))
+        metadata = existing_metadata.get(str(doc.file_id))
         if metadata is not None:
             site = metadata["site"]
             document_type = metadata["document_type"].lower()
-            s3.delete_object(f"kb_documents/{site}/{document_type}", f"{doc.file_id}.pdf")
-            s3.delete_object(f"kb_documents/{site}/{document_type}", f"{doc.file_id}.pdf.metadata.json")
-            dynamodb.delete_document(metadata)
+            keys = [f"kb_documents/{site}/{document_type}/{doc.file_id}.pdf", f"kb_documents/{site}/{document_type}/{doc.file_id}.pdf.metadata.json"]
+            withdrawn.append((doc, metadata, keys))
+    # DeleteObjects removes up to 1000 keys per call instead of two DeleteObject calls per document
+    failed_keys = set(s3.delete_objects(key for _, _, keys in withdrawn for key in keys))
+    with dynamodb.batch_writer(overwrite_by_pkeys=["file_id"]) as writer:
+        for doc, metadata, keys in withdrawn:
+            if failed_keys.intersection(keys):
+                logger.error("Keeping DynamoDB entry for doc %s: S3 delete failed", doc.file_id)
+                continue
+            writer.delete(metadata)
             deleted_docs[doc.file_id] = "DELETE"
     return deleted_docs
 
 def retrieve_documents(experiment_id: str, execution_type: Literal["Incremental", "Load"]) -> List[str]:
     list_of_documents = {"Experiment ID": experiment_id}
-    veeva, dynamodb, sns, s3, email, _, _, _, _ = initialize_services()
+    veeva, dynamodb, sns, s3, email, _, _, _, _, _ = initialize_services()
     try:
         veeva_data = get_veeva_data(veeva, s3)
         update_s3_json_files(s3, veeva_data)
-        download_files_list, doc_status = process_documents(veeva, dynamodb, veeva_data, execution_type)
+        download_files_list, doc_status = process_documents(veeva, dynamodb, veeva_data, execution_type, s3)
         list_of_documents.update(doc_status)
         list_of_documents["nº Checked Documents"] = len(download_files_list)
         job_ids = submit_export_jobs(veeva, sns, download_files_list)
         list_of_documents["job_ids"] = "-".join(job_ids) if job_ids else ""
         deleted_docs = delete_withdrawn_documents(veeva, dynamodb, s3)
         list_of_documents.update(deleted_docs)
+        commit_watermarks()
+        dynamodb.log_stats()
+        veeva.log_stats()
         email.format_email("[SUCCESS]. Synchronization planned.", list_of_documents)
         return job_ids
     except Exception as e:
@@ -121,6 +217,25 @@ def retrieve_documents(experiment_id: str, execution_type: Literal["Incremental"
         email.format_email("[FAILURE]. An error was found.", list_of_documents)
         return []
 
+def resume_pending_documents(experiment_id: str, site: str | None = None, document_type: str | None = None) -> List[str]:
+    """Re-export only documents left in DOWNLOADING by an earlier failed run."""
+    list_of_documents = {"Experiment ID": experiment_id}
+    veeva, dynamodb, sns, s3, email, _, _, _, _, config = initialize_services()
+    try:
+        file_ids = list(dynamodb.file_ids_by_status("DOWNLOADING", site=site, document_type=document_type))
+        logger.info("Found %d documents stuck in DOWNLOADING", len(file_ids))
+        list_of_documents["nº Pending Documents"] = len(file_ids)
+        job_ids = [str(veeva.submit_export_document_ids(file_ids[i:i+100])) for i in range(0, len(file_ids), 100)]
+        list_of_documents["job_ids"] = "-".join(job_ids) if job_ids else ""
+        veeva.log_stats()
+        email.format_email("[SUCCESS]. Pending documents resubmitted.", list_of_documents)
+        return job_ids
+    except Exception as e:
+        logger.error("An error occurred: %s", str(e), exc_info=True)
+        list_of_documents["error"] = str(e)
+        email.format_email("[FAILURE]. An error was found.", list_of_documents)
+        return []
+
 def pipeline_retrieve_documents(experiment_id: str, execution_type: str, email: Email):
     start_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     process_steps = []
@@ -132,7 +247,7 @@ def pipeline_retrieve_documents(experiment_id: str, execution_type: str, email:
         veeva, file_ingestion, sns, s3, _, bedrock, kbr_questions_table, llm, sm, config = initialize_services()
         veeva_data = get_veeva_data(veeva, s3)
         update_s3_json_files(s3, veeva_data)
-        download_files_list, doc_status = process_documents(veeva, file_ingestion, veeva_data, execution_type)
+        download_files_list, doc_status = process_documents(veeva, file_ingestion, veeva_data, execution_type, s3)
         process_steps.append({"step": "Process documents", "description": f"{len(download_files_list)} documents processed.", "status": "OK", "details": "<br>".join([f"{doc}: {status}" for doc, status in doc_status.items()])})
         job_ids = submit_export_jobs(veeva, sns, download_files_list)
         process_steps.append({"step": "Submit export jobs", "description": f"{len(job_ids)} export jobs submitted.", "status": "OK", "details": ", ".join(job_ids)})
@@ -141,6 +256,9 @@ def pipeline_retrieve_documents(experiment_id: str, execution_type: str, email:
             process_steps.append({"step": "Delete withdrawn documents", "description": f"{len(deleted_docs)} withdrawn documents deleted.", "status": "OK", "details": ", ".join([str(doc_id) for doc_id in deleted_docs])})
         else:
             process_steps.append({"step": "Delete withdrawn documents", "description": "No withdrawn documents found.", "status": "OK"})
+        commit_watermarks()
+        file_ingestion.log_stats()
+        veeva.log_stats()
         end_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         email_data = {"start_time": start_time, "end_time": end_time, "process_steps": process_steps, "summary": summary, "errors": errors, "raw_data": raw_data}
         email.format_email(f"Document Retrieval Pipeline [{experiment_id}] - SUCCESS", email_data)
@@ -0,0 +1,159 @@
+"""Streaming retrieve -> export -> download pipeline.
+
+Runs the same steps as the ``retrieve`` and ``download`` phases, but page by page:
+the first export job is submitted as soon as enough documents are matched, and
+completed jobs are downloaded while later VQL pages are still being retrieved.
+Progress is checkpointed in a ``RunJournal`` so an interrupted run can be resumed.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+from src.connectors.export_poller import ExportJobPoller
+from src.logging import SingletonLogger
+from src.lookups import RelationResolver
+from src.models import DocumentMetadata
+from src.pipelines.download_documents import download_export_documents
+from src.pipelines.retrieve_documents import (delete_withdrawn_documents, document_version_key, get_impacted_business_areas,
+                                              get_site_queries, get_veeva_data, plan_documents, update_s3_json_files)
+from src.run_journal import RunJournal
+from src.site_matcher import SiteMatcher
+from src.streaming import Stage, StreamingPipeline
+from src.utils import initialize_services
+from src.watermarks import advance_watermark, commit_watermarks
+
+logger = SingletonLogger().get_logger()
+
+
+def journal_key(doc: DocumentMetadata) -> str:
+    file_id, major_version, minor_version = document_version_key(doc)
+    return f"{file_id}:{major_version}.{minor_version}"
+
+
+def stream_documents(experiment_id: str, execution_type: Literal["Incremental", "Load"], resume: bool = False) -> List[str]:
+    """Retrieve, export and download in one pass; with ``resume`` skip work the journal of ``experiment_id`` records as done."""
+    list_of_documents: Dict[str, Any] = {"Experiment ID": experiment_id}
+    veeva, dynamodb, _, s3, email, bedrock, _, _, _, config = initialize_services()
+    logger.info("Streaming run %s (%s)%s", experiment_id, execution_type, " resuming from journal" if resume else "")
+    journal = RunJournal(experiment_id, s3, resume=resume, **config.get("run_journal", {}))
+    pipeline_config = config.get("pipeline", {})
+    options = pipeline_config.get("streaming", {})
+    queue_size = options.get("queue_size", 4)
+    export_batch_size = options.get("export_batch_size", 100)
+    job_ids: List[str] = []
+    errors: List[Dict[str, Any]] = []
+    downloaded = 0
+    try:
+        veeva_data = get_veeva_data(veeva, s3)
+        update_s3_json_files(s3, veeva_data)
+        impacted_business_areas = get_impacted_business_areas(execution_type)
+        queries = [query for query in get_site_queries(veeva_data, impacted_business_areas, execution_type) if not journal.query_done(query)]
+        resolver = RelationResolver(veeva_data)
+        site_matcher = SiteMatcher(impacted_business_areas, veeva_data)
+        poller = ExportJobPoller(veeva, **pipeline_config.get("export_poller", {}))
+        # Taken before any stage runs, so work journaled by this run is not mistaken for leftovers
+        resumed_jobs = journal.open_jobs()
+        resumed_exports = journal.pending_exports()
+        seen = set()
+
+        def fetch(pending_queries: Iterator[str]) -> Iterator[Tuple[str, Optional[List[DocumentMetadata]]]]:
+            for query in pending_queries:
+                for page in veeva.iter_vql_pages(DocumentMetadata, execution_type, query=query):
+                    yield query, page
+                # Pages of one query reach the single plan worker in order, so this arrives last
+                yield query, None
+
+        def plan(pages: Iterator[Tuple[str, Optional[List[DocumentMetadata]]]]) -> Iterator[List[str]]:
+            for query, page in pages:
+                if page is None:
+                    journal.finish_query(query)
+                    continue
+                # Sites overlap, ALLVERSIONS repeats ids across versions, and a resumed run re-reads unfinished queries
+                page = [doc for doc in page if document_version_key(doc) not in seen and not journal.is_checked(journal_key(doc))]
+                seen.update(document_version_key(doc) for doc in page)
+                advance_watermark(DocumentMetadata.__name__, (doc.version_modified_date for doc in page))
+                resolver.resolve_many(page)
+                download_files_list, doc_status = plan_documents(dynamodb, s3, page, site_matcher, execution_type)
+                list_of_documents.update(doc_status)
+                file_ids = [str(doc.file_id) for doc in download_files_list]
+                journal.record_page(query, (journal_key(doc) for doc in page), file_ids)
+                if file_ids:
+                    yield file_ids
+
+        def submit(chunk: List[str]) -> str:
+            job_id = str(veeva.submit_export_document_ids(chunk))
+            logger.info("Submitted export job %s for %d documents", job_id, len(chunk))
+            journal.record_job(job_id, chunk)
+            job_ids.append(job_id)
+            return job_id
+
+        def export(batches: Iterator[List[str]]) -> Iterator[str]:
+            # Documents planned before an interruption but never submitted go first
+            pending: List[str] = list(resumed_exports)
+            for batch in batches:
+                pending.extend(batch)
+                while len(pending) >= export_batch_size:
+                    yield submit(pending[:export_batch_size])
+                    pending = pending[export_batch_size:]
+            if pending:
+                yield submit(pending)
+
+        def poll(submitted: Iterator[str]) -> Iterator[Tuple[str, List[Any], Any]]:
+            def track() -> None:
+                try:
+                    for job_id in resumed_jobs:
+                        poller.add(job_id)
+                    for job_id in submitted:
+                        poller.add(job_id)
+                finally:
+                    poller.close()
+
+            threading.Thread(target=track, name="stream-track-exports", daemon=True).start()
+            yield from poller
+
+        def download(jobs: Iterator[Tuple[str, List[Any], Any]]) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+            for job_id, export_documents, job_err in jobs:
+                if job_err is not None:
+                    yield [], [{"step": "Download job failed", "description": f"Job ID: {job_id}", "status": "FAILED", "details": str(job_err)}]
+                    continue
+                remaining = [doc for doc in export_documents if not journal.is_downloaded(doc.id)]
+                done: List[str] = []
+                doc_results, doc_errors = download_export_documents(remaining, veeva, dynamodb, s3, bedrock, on_success=lambda doc: done.append(doc.id))
+                journal.record_downloaded(done)
+                # Skipped documents stay open so a resumed run checks them again
+                if len(done) == len(remaining):
+                    journal.finish_job(job_id)
+                yield doc_results, doc_errors
+
+        pipeline = StreamingPipeline([
+            Stage("fetch", fetch, workers=pipeline_config.get("site_query_workers", 4), queue_size=len(queries) or 1),
+            Stage("plan", plan, queue_size=queue_size),
+            Stage("export", export, queue_size=queue_size),
+            Stage("poll", poll, queue_size=queue_size),
+            Stage("download", download, workers=options.get("download_workers", 2), queue_size=queue_size),
+        ])
+        try:
+            for doc_results, doc_errors in pipeline.run(queries):
+                downloaded += len(doc_results)
+                errors.extend(doc_errors)
+        finally:
+            pipeline.log_metrics()
+            journal.save(force=True)
+
+        list_of_documents["nº Checked Documents"] = len(seen)
+        list_of_documents["nº Downloaded Documents"] = downloaded
+        list_of_documents["job_ids"] = "-".join(job_ids)
+        list_of_documents.update(delete_withdrawn_documents(veeva, dynamodb, s3))
+        if errors:
+            list_of_documents["errors"] = "<br>".join(f"{e['description']}: {e.get('details', '')}" for e in errors)
+        else:
+            commit_watermarks()
+        dynamodb.log_stats()
+        veeva.log_stats()
+        email.format_email("[SUCCESS]. Synchronization completed." if not errors else "[PARTIAL]. Some documents failed.", list_of_documents)
+        return job_ids
+    except Exception as e:
+        logger.error("An error occurred: %s", str(e), exc_info=True)
+        list_of_documents["error"] = str(e)
+        email.format_email("[FAILURE]. An error was found.", list_of_documents)
+        return job_ids
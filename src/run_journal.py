@@ -0,0 +1,189 @@
+"""Per-run journal that lets an interrupted streaming run resume where it stopped.
+
+Keyed by experiment id, it records which VQL queries were fully processed, which
+documents were already checked and which still need exporting, the export jobs
+submitted with their documents, and every document downloaded and uploaded. Each
+change is appended as one line to a local JSONL event log; the log is compacted
+into the snapshot, which is mirrored to S3, at most every ``sync_interval``
+seconds and always on ``save(force=True)``. Resuming replays the log on top of
+the snapshot.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+JOB_SUBMITTED = "SUBMITTED"
+JOB_DONE = "DONE"
+
+
+def query_key(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    """Checkpoints of one run, stored as ``<folder>/<experiment_id>.json``.
+
+    Args:
+        experiment_id (str): Run the journal belongs to.
+        s3: Optional S3 connector for the shared copy.
+        folder (str): S3 folder for journals.
+        local_dir (str): Local directory for journals.
+        sync_interval (float): Minimum seconds between two compactions and S3 writes.
+        resume (bool): Load the existing journal for ``experiment_id`` instead of starting empty.
+    """
+
+    def __init__(self, experiment_id: str, s3=None, folder: str = "checkpoints/runs", local_dir: str = "tmp/checkpoints/runs",
+                 sync_interval: float = 30, resume: bool = False):
+        self.experiment_id = experiment_id
+        self.s3 = s3
+        self.folder = folder
+        self.file_name = f"{experiment_id}.json"
+        self.local_path = os.path.join(local_dir, self.file_name)
+        self.events_path = os.path.join(local_dir, f"{experiment_id}.events.jsonl")
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_sync = 0.0
+        data, events = self._load() if resume else ({}, [])
+        self._queries: Dict[str, Dict[str, Any]] = data.get("queries", {})
+        self._checked = set(data.get("checked", []))
+        self._to_export = set(data.get("to_export", []))
+        self._jobs: Dict[str, Dict[str, Any]] = data.get("jobs", {})
+        self._downloaded = set(data.get("downloaded", []))
+        self._submitted = {file_id for job in self._jobs.values() for file_id in job["file_ids"]}
+        for event in events:
+            self._apply(event)
+        # Folds a replayed log into the snapshot, or clears what an earlier run with this id left behind
+        os.makedirs(local_dir, exist_ok=True)
+        with self._write_lock:
+            self._compact(mirror=False)
+        if resume:
+            logger.info("Resuming run %s: %d queries done, %d documents checked, %d jobs, %d documents downloaded",
+                        experiment_id, sum(1 for q in self._queries.values() if q.get("done")), len(self._checked),
+                        len(self._jobs), len(self._downloaded))
+
+    def _load(self) -> tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        data: Dict[str, Any] = {}
+        if os.path.exists(self.local_path):
+            with open(self.local_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        elif self.s3 is not None:
+            # Local copy is lost when the run restarts on another host
+            data = self.s3.get_json(self.folder, self.file_name) or {}
+        events = []
+        if os.path.exists(self.events_path):
+            with open(self.events_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A crash can leave the last line half written
+                        break
+        if not data and not events:
+            logger.warning("No journal found for run %s; starting from scratch", self.experiment_id)
+        return data, events
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        op = event["op"]
+        if op == "page":
+            if event["query"] is not None:
+                self._queries.setdefault(event["query"], {"pages": 0, "done": False})["pages"] += 1
+            self._checked.update(event["checked"])
+            self._to_export.update(event["to_export"])
+        elif op == "query_done":
+            self._queries.setdefault(event["query"], {"pages": 0, "done": False})["done"] = True
+        elif op == "job":
+            self._jobs[event["job_id"]] = {"file_ids": event["file_ids"], "status": JOB_SUBMITTED}
+            self._submitted.update(event["file_ids"])
+        elif op == "job_done":
+            if event["job_id"] in self._jobs:
+                self._jobs[event["job_id"]]["status"] = JOB_DONE
+        elif op == "downloaded":
+            self._downloaded.update(event["file_ids"])
+
+    def _record(self, event: Dict[str, Any]) -> None:
+        # Serialised so the log replays in the order the changes were applied
+        with self._write_lock:
+            with self._lock:
+                self._apply(event)
+            with open(self.events_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, separators=(",", ":")) + "\n")
+            if time.monotonic() - self._last_sync >= self.sync_interval:
+                self._compact(mirror=True)
+
+    def _snapshot(self) -> str:
+        return json.dumps({
+            "experiment_id": self.experiment_id,
+            "queries": self._queries,
+            "checked": list(self._checked),
+            "to_export": list(self._to_export),
+            "jobs": self._jobs,
+            "downloaded": list(self._downloaded),
+        }, separators=(",", ":"))
+
+    def _compact(self, mirror: bool) -> None:
+        # Caller holds _write_lock
+        with self._lock:
+            content = self._snapshot()
+        tmp_path = f"{self.local_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.local_path)
+        open(self.events_path, "w", encoding="utf-8").close()
+        if mirror:
+            if self.s3 is not None:
+                self.s3.put_object(content, self.folder, self.file_name)
+            self._last_sync = time.monotonic()
+
+    def save(self, force: bool = False) -> None:
+        """Compact the event log and mirror it to S3 when ``sync_interval`` has passed, or now with ``force``."""
+        with self._write_lock:
+            if force or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._compact(mirror=True)
+
+    def query_done(self, query: str) -> bool:
+        with self._lock:
+            return self._queries.get(query_key(query), {}).get("done", False)
+
+    def is_checked(self, key: str) -> bool:
+        with self._lock:
+            return key in self._checked
+
+    def record_page(self, query: Optional[str], checked: Iterable[str], to_export: Iterable[Any]) -> None:
+        """Mark a processed page: ``checked`` document keys and the file ids it queued for export."""
+        self._record({"op": "page", "query": query_key(query) if query is not None else None,
+                      "checked": list(checked), "to_export": [str(f) for f in to_export]})
+
+    def finish_query(self, query: str) -> None:
+        self._record({"op": "query_done", "query": query_key(query)})
+
+    def pending_exports(self) -> List[str]:
+        """Documents planned for export whose job was never submitted."""
+        with self._lock:
+            return sorted(self._to_export - self._submitted)
+
+    def record_job(self, job_id: str, file_ids: Iterable[Any]) -> None:
+        self._record({"op": "job", "job_id": str(job_id), "file_ids": [str(f) for f in file_ids]})
+
+    def open_jobs(self) -> List[str]:
+        """Submitted jobs whose documents were not all handled yet."""
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job["status"] == JOB_SUBMITTED]
+
+    def finish_job(self, job_id: str) -> None:
+        self._record({"op": "job_done", "job_id": str(job_id)})
+
+    def is_downloaded(self, file_id: Any) -> bool:
+        with self._lock:
+            return str(file_id) in self._downloaded
+
+    def record_downloaded(self, file_ids: Iterable[Any]) -> None:
+        self._record({"op": "downloaded", "file_ids": [str(f) for f in file_ids]})
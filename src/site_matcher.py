@@ -0,0 +1,100 @@
+"""Compiled site matching for impacted business areas.
+
+Equivalent to walking the configured sites in order and returning the first one
+for which ``DocumentMetadata.filter_by_impacted_business_area`` holds, but the
+site configuration is compiled once into per-area inverted indexes of bitmasks
+(bit ``i`` = ``i``-th site), so a document costs one dict lookup per value.
+
+Configured values may be Vault ids or lookup names; both are indexed, so a site
+matches documents whether or not their relations were already resolved to names.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+def _names_to_ids(lookup: Dict[str, str]) -> Dict[str, Set[str]]:
+    reverse: Dict[str, Set[str]] = {}
+    for key, name in lookup.items():
+        reverse.setdefault(name, set()).add(key)
+    return reverse
+
+
+class SiteMatcher:
+    """First-match site lookup over ``{site: [area_1_values, ..., area_6_values]}``.
+
+    Areas below ``required_impacted_areas`` must be set on the document and share a
+    value with the site. The remaining areas pass when the document leaves them empty,
+    the site does not restrict them, or they share a value. ``veeva_data`` supplies the
+    ``business_area_<n>`` lookups that relate configured ids and names.
+    """
+
+    def __init__(self, impacted_business_areas: Dict[str, Sequence[Sequence[str]]],
+                 veeva_data: Optional[Dict[str, Dict[str, str]]] = None, required_impacted_areas: int = 2):
+        self.sites: List[str] = list(impacted_business_areas)
+        self.required_impacted_areas = required_impacted_areas
+        self.all_sites = (1 << len(self.sites)) - 1
+        self._index: List[Dict[Any, int]] = [{} for _ in range(6)]
+        # Per area, sites that accept any value because they configure none
+        self._unrestricted: List[int] = [0] * 6
+        lookups = [(veeva_data or {}).get(f"business_area_{idx+1}", {}) for idx in range(6)]
+        reverse = [_names_to_ids(lookup) for lookup in lookups]
+        for bit, site in enumerate(self.sites):
+            areas = impacted_business_areas[site]
+            assert len(areas) == 6
+            for idx, possible_values in enumerate(areas):
+                if not possible_values and idx >= required_impacted_areas:
+                    self._unrestricted[idx] |= 1 << bit
+                for value in possible_values:
+                    for key in {value, lookups[idx].get(value, value), *reverse[idx].get(value, ())}:
+                        self._index[idx][key] = self._index[idx].get(key, 0) | 1 << bit
+
+    def _candidates(self, idx: int, real_values: Optional[Sequence[Any]]) -> int:
+        if not real_values:
+            return 0 if idx < self.required_impacted_areas else self.all_sites
+        index = self._index[idx]
+        mask = self._unrestricted[idx]
+        for value in real_values:
+            mask |= index.get(value, 0)
+        return mask
+
+    def match(self, model) -> Optional[str]:
+        mask = self.all_sites
+        for idx in range(6):
+            mask &= self._candidates(idx, getattr(model, f"impacted_business_area_{idx+1}"))
+            if not mask:
+                return None
+        # Lowest set bit = earliest site in configuration order
+        return self.sites[(mask & -mask).bit_length() - 1]
+
+
+def _vql_literal(value: Any) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def site_vql_filters(impacted_business_areas: Dict[str, Sequence[Sequence[str]]], veeva_data: Dict[str, Dict[str, str]],
+                     required_impacted_areas: int = 2) -> Dict[str, List[str]]:
+    """VQL conditions pre-selecting each site's candidates, as ``{condition: [sites]}``.
+
+    Only the required areas are pushed down, as ``CONTAINS`` over the ids behind the
+    configured names; the optional areas are left to ``SiteMatcher`` to confirm.
+    Sites sharing a condition share one query, and sites that cannot match are dropped.
+    """
+    name_to_ids = [_names_to_ids(veeva_data.get(f"business_area_{idx+1}", {})) for idx in range(required_impacted_areas)]
+
+    filters: Dict[str, List[str]] = {}
+    for site, areas in impacted_business_areas.items():
+        clauses = []
+        for idx in range(required_impacted_areas):
+            # Values without a lookup entry are passed through as ids
+            ids = sorted({key for value in areas[idx] if value for key in name_to_ids[idx].get(value, {value})})
+            if not ids:
+                logger.warning("Site %s has no values for impacted_business_area_%d; it can never match", site, idx + 1)
+                break
+            clauses.append(f"impacted_business_area_{idx+1}__c CONTAINS ({', '.join(_vql_literal(key) for key in ids)})")
+        if len(clauses) == required_impacted_areas:
+            filters.setdefault(" AND ".join(clauses), []).append(site)
+    return filters
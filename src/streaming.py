@@ -0,0 +1,183 @@
+"""Staged streaming engine with bounded queues between stages.
+
+Each stage runs in its own thread(s) and hands results to the next stage through
+a bounded queue, so downstream work starts on the first item instead of after the
+last one, and a slow stage blocks the ones feeding it (backpressure) instead of
+letting work pile up in memory.
+"""
+from __future__ import annotations
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+_END = object()
+
+
+class Stage:
+    """One step of a ``StreamingPipeline``.
+
+    ``fn`` maps an iterator of inputs to an iterator of outputs, so a stage can
+    filter, fan out or batch (flushing the remainder once its input is exhausted).
+    With ``workers > 1`` each worker runs ``fn`` over the shared input queue.
+
+    Args:
+        name (str): Label used in logs and metrics.
+        fn (Callable): ``fn(inputs) -> outputs``.
+        workers (int): Threads running ``fn`` concurrently.
+        queue_size (int): Capacity of the queue feeding this stage.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Iterator[Any]], Iterable[Any]], workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+        self._stats = {"items_in": 0, "items_out": 0, "wait_in_seconds": 0.0, "wait_out_seconds": 0.0}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def _record(self, **deltas: float) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        # Worker time not spent blocked on either queue
+        busy = max(0.0, elapsed * self.workers - stats["wait_in_seconds"] - stats["wait_out_seconds"])
+        stats.update({
+            "stage": self.name,
+            "elapsed_seconds": elapsed,
+            "busy_seconds": busy,
+            "items_per_second": stats["items_in"] / elapsed if elapsed else 0.0,
+            "utilization": busy / (elapsed * self.workers) if elapsed else 0.0,
+        })
+        return stats
+
+
+class StreamingPipeline:
+    """Runs ``stages`` as a chain of threads connected by bounded queues.
+
+    ``run(source)`` yields the last stage's outputs as they are produced. The first
+    exception raised by any stage stops every stage and is re-raised by ``run``.
+    """
+
+    def __init__(self, stages: List[Stage], poll_interval: float = 0.5):
+        if not stages:
+            raise ValueError("StreamingPipeline needs at least one stage")
+        self.stages = stages
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def _fail(self, error: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _feed(self, source: Iterable[Any], outbox: queue.Queue) -> None:
+        try:
+            for item in source:
+                if not self._put(outbox, item):
+                    return
+        except Exception as e:
+            logger.error("Streaming source failed: %s", str(e), exc_info=True)
+            self._fail(e)
+            return
+        self._put(outbox, _END)
+
+    def _inputs(self, stage: Stage, inbox: queue.Queue) -> Iterator[Any]:
+        while True:
+            start = time.perf_counter()
+            item = self._get(inbox)
+            stage._record(wait_in_seconds=time.perf_counter() - start)
+            if item is _END:
+                # Leave the marker for sibling workers of the same stage
+                try:
+                    inbox.put_nowait(_END)
+                except queue.Full:
+                    pass
+                return
+            stage._record(items_in=1)
+            yield item
+
+    def _work(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: List[int], lock: threading.Lock) -> None:
+        try:
+            for output in stage.fn(self._inputs(stage, inbox)):
+                start = time.perf_counter()
+                delivered = self._put(outbox, output)
+                stage._record(wait_out_seconds=time.perf_counter() - start)
+                if not delivered:
+                    return
+                stage._record(items_out=1)
+        except Exception as e:
+            logger.error("Streaming stage %s failed: %s", stage.name, str(e), exc_info=True)
+            self._fail(e)
+            return
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                stage._finished = time.perf_counter()
+        if last:
+            self._put(outbox, _END)
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue(maxsize=self.stages[-1].queue_size))
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name="stream-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            stage._started = time.perf_counter()
+            remaining, lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=self._work, args=(stage, queues[i], queues[i + 1], remaining, lock),
+                                                name=f"stream-{stage.name}-{n}", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while (item := self._get(queues[-1])) is not _END:
+                yield item
+        finally:
+            self._stop.set()
+        if self._error is not None:
+            raise self._error
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        return [stage.metrics() for stage in self.stages]
+
+    def log_metrics(self) -> None:
+        for m in self.metrics():
+            logger.info("Stage %s: %d in / %d out in %.1fs (%.2f items/s, %.0f%% busy, %.1fs waiting for input, %.1fs blocked on output)",
+                        m["stage"], m["items_in"], m["items_out"], m["elapsed_seconds"], m["items_per_second"],
+                        m["utilization"] * 100, m["wait_in_seconds"], m["wait_out_seconds"])
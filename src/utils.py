@@ -6,6 +6,8 @@ from functools import lru_cache
 from typing import Any, Dict, List, Tuple
 
 from src.connectors import Veeva, FileIngestion, SNS, S3, Email, BedrockAgent, DynamoDB, LLM, SecretManager
+from src.connectors.table_cache import CachedTable
+from src.watermarks import WatermarkStore, configure_watermarks
 
 PIPELINE_CONFIG_PATH = os.environ.get("PIPELINE_CONFIG_PATH", "pipeline_config.dev.json")
 
@@ -35,17 +37,19 @@ def initialize_services() -> Tuple:
         f"{sm.get('veeva_url')}/api/v24.3/",
         sm.get("veeva_username"),
         sm.get("veeva_password"),
-        sm.get("veeva_session_id")
+        sm.get("veeva_session_id"),
+        **config.get("veeva", {})
     )
-    file_ingestion_table = FileIngestion(sm.get("dynamodb_file_ingest_table"))
+    file_ingestion_table = CachedTable(FileIngestion(sm.get("dynamodb_file_ingest_table")), **config.get("table_cache", {}))
     kbr_questions_table = DynamoDB(config.get("dynamodb_table"))
     sns = SNS("arn:aws:sns:placeholder")  # placeholder
-    s3 = S3(config.get("s3_bucket"))
+    s3 = S3(config.get("s3_bucket"), **config.get("s3_transfer", {}))
     email = Email("placeholder", [
         "ops@example.com"
     ])
     bedrock = BedrockAgent(sm.get("knowledge_id"), sm.get("datasource_id"))
     llm = LLM()
+    configure_watermarks(WatermarkStore(s3, **config.get("watermarks", {})))
     return (veeva, file_ingestion_table, sns, s3, email, bedrock, kbr_questions_table, llm, sm, config)
 
 @lru_cache()
@@ -0,0 +1,121 @@
+"""Persisted high-watermarks for incremental VQL queries.
+
+Each model/table keeps the latest modification timestamp that a successful run
+actually processed. Incremental queries then ask Vault only for rows changed
+since that mark (minus a small overlap) instead of a fixed two-day window.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from src.experiment import get_two_days_records
+from src.logging import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+VAULT_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def parse_vault_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # fromisoformat is several times faster than strptime; the trailing Z is dropped to keep results naive
+    try:
+        return datetime.fromisoformat(value[:-1] if value.endswith("Z") else value)
+    except ValueError:
+        return datetime.strptime(value, VAULT_DATETIME_FORMAT)
+
+
+def format_vql_datetime(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class WatermarkStore:
+    """Watermarks kept in a local JSON file and mirrored to S3.
+
+    Advances are staged in memory and only persisted by ``commit``, so a failed
+    run never moves a watermark past work it did not finish.
+    """
+
+    def __init__(self, s3=None, folder: str = "checkpoints", file_name: str = "watermarks.json",
+                 local_dir: str = "tmp/checkpoints", overlap_minutes: float = 60):
+        self.s3 = s3
+        self.folder = folder
+        self.file_name = file_name
+        self.local_path = os.path.join(local_dir, file_name)
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, datetime] = {}
+        self._marks: Dict[str, datetime] = self._load()
+
+    def _load(self) -> Dict[str, datetime]:
+        raw: Dict[str, str] = {}
+        if os.path.exists(self.local_path):
+            with open(self.local_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        if self.s3 is not None:
+            # S3 is the shared copy; keep whichever mark is further ahead
+            for key, value in self.s3.get_json(self.folder, self.file_name).items():
+                raw[key] = max(raw.get(key, value), value)
+        return {key: parse_vault_datetime(value) for key, value in raw.items() if value}
+
+    def get(self, key: str) -> Optional[datetime]:
+        with self._lock:
+            return self._marks.get(key)
+
+    def since(self, key: str) -> Optional[str]:
+        mark = self.get(key)
+        return format_vql_datetime(mark - self.overlap) if mark else None
+
+    def advance(self, key: str, values: Iterable[Optional[datetime]]) -> None:
+        latest = max((v for v in values if v is not None), default=None)
+        if latest is None:
+            return
+        with self._lock:
+            if key not in self._pending or latest > self._pending[key]:
+                self._pending[key] = latest
+
+    def commit(self) -> None:
+        with self._lock:
+            for key, value in self._pending.items():
+                if key not in self._marks or value > self._marks[key]:
+                    self._marks[key] = value
+            self._pending.clear()
+            content = json.dumps({key: value.strftime(VAULT_DATETIME_FORMAT) for key, value in sorted(self._marks.items())}, indent=2)
+        os.makedirs(os.path.dirname(self.local_path), exist_ok=True)
+        with open(self.local_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        if self.s3 is not None:
+            self.s3.put_object(content, self.folder, self.file_name)
+        logger.info("Committed watermarks: %s", content)
+
+
+_store: Optional[WatermarkStore] = None
+
+
+def configure_watermarks(store: Optional[WatermarkStore]) -> None:
+    global _store
+    _store = store
+
+
+def get_incremental_since(key: str) -> str:
+    """Lower bound for an incremental query: the stored watermark minus overlap, else two days ago."""
+    since = _store.since(key) if _store is not None else None
+    return since or get_two_days_records()
+
+
+def get_watermark(key: str) -> Optional[datetime]:
+    return _store.get(key) if _store is not None else None
+
+
+def advance_watermark(key: str, values: Iterable[Optional[datetime]]) -> None:
+    if _store is not None:
+        _store.advance(key, values)
+
+
+def commit_watermarks() -> None:
+    if _store is not None:
+        _store.commit()
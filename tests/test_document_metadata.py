@@ -0,0 +1,26 @@
+from src.models.document_metadata import DocumentMetadata
+
+
+def make_row(i):
+    return {
+        "id": str(i), "name__v": f"Doc {i}", "document_number__v": f"SOP-{i}", "status__v": "Effective",
+        "language__v": "".join(["e", "n"]), "country__v": "ES", "md5checksum__v": f"md5-{i}",
+        "version_modified_date__v": "2024-01-02T10:00:00.000Z", "file_created_date__v": None,
+        "major_version_number__v": "2", "minor_version_number__v": None,
+        "impacted_business_area_1__c": ["10", "11"], "impacted_business_area_2__c": "20",
+    }
+
+
+def test_page_parse_matches_row_parse():
+    rows = [make_row(i) for i in range(3)]
+    for many, one in zip(DocumentMetadata.model_validate_many(rows), (DocumentMetadata.model_validate(r) for r in rows)):
+        assert many.model_dump() == one.model_dump()
+        assert [getattr(many, f"impacted_business_area_{i}") for i in range(1, 7)] == [["10", "11"], ["20"], [], [], [], []]
+        assert (many.major_version, many.minor_version, many.file_created_date) == (2, 0, None)
+
+
+def test_page_parse_shares_repeated_values():
+    first, second = DocumentMetadata.model_validate_many([make_row(1), make_row(2)])
+    assert first.language is second.language
+    assert first.version_modified_date is second.version_modified_date
+    assert first.impacted_business_area_1[0] is second.impacted_business_area_1[0]
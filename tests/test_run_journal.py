@@ -0,0 +1,93 @@
+import json
+import os
+
+from src.run_journal import RunJournal
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, content, folder, file_name):
+        self.objects[(folder, file_name)] = content
+
+    def get_json(self, folder, file_name):
+        content = self.objects.get((folder, file_name))
+        return json.loads(content) if content else {}
+
+
+def interrupted_journal(tmp_path, s3=None):
+    journal = RunJournal("run-1", s3, folder="runs", local_dir=str(tmp_path), sync_interval=3600)
+    journal.record_page("q1", ["1:1.0", "2:1.0", "3:1.0"], ["1", "2", "3"])
+    journal.finish_query("q1")
+    journal.record_page("q2", ["4:1.0"], ["4"])
+    journal.record_job("job-1", ["1", "2"])
+    journal.record_job("job-2", [3])
+    journal.record_downloaded(["1", "2"])
+    journal.finish_job("job-1")
+    journal.record_downloaded(["3"])
+    # Crash: job-2 was never closed and document 4 never submitted
+    return journal
+
+
+def test_resume_round_trip(tmp_path):
+    interrupted_journal(tmp_path)
+    journal = RunJournal("run-1", local_dir=str(tmp_path), resume=True)
+    assert journal.query_done("q1")
+    assert not journal.query_done("q2")
+    assert journal.is_checked("4:1.0") and not journal.is_checked("5:1.0")
+    assert journal.pending_exports() == ["4"]
+    assert journal.open_jobs() == ["job-2"]
+    assert journal.is_downloaded(3) and not journal.is_downloaded("4")
+
+
+def test_resume_reads_s3_copy_when_local_copy_is_lost(tmp_path):
+    s3 = FakeS3()
+    journal = interrupted_journal(tmp_path / "host-1", s3)
+    journal.save(force=True)
+    resumed = RunJournal("run-1", s3, folder="runs", local_dir=str(tmp_path / "host-2"), resume=True)
+    assert resumed.pending_exports() == ["4"]
+    assert resumed.open_jobs() == ["job-2"]
+
+
+def test_s3_writes_are_throttled_until_forced(tmp_path):
+    s3 = FakeS3()
+    journal = RunJournal("run-1", s3, folder="runs", local_dir=str(tmp_path), sync_interval=3600)
+    journal.record_page("q1", ["1:1.0"], ["1"])
+    journal.record_job("job-1", ["1"])
+    assert "job-1" not in s3.objects.get(("runs", "run-1.json"), "")
+    journal.save(force=True)
+    assert "job-1" in json.loads(s3.objects[("runs", "run-1.json")])["jobs"]
+
+
+def test_new_run_ignores_existing_journal(tmp_path):
+    interrupted_journal(tmp_path)
+    journal = RunJournal("run-1", local_dir=str(tmp_path))
+    assert journal.pending_exports() == []
+    assert journal.open_jobs() == []
+    assert not journal.query_done("q1")
+
+
+def test_changes_are_appended_until_compaction(tmp_path):
+    journal = RunJournal("run-1", local_dir=str(tmp_path), sync_interval=3600)
+    journal.save(force=True)
+    journal.record_page("q1", ["1:1.0"], ["1"])
+    journal.record_job("job-1", ["1"])
+    journal.record_downloaded(["1"])
+    with open(journal.events_path, encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["page", "job", "downloaded"]
+    with open(journal.local_path, encoding="utf-8") as f:
+        assert json.load(f)["jobs"] == {}
+    journal.save(force=True)
+    assert os.path.getsize(journal.events_path) == 0
+    with open(journal.local_path, encoding="utf-8") as f:
+        assert "job-1" in json.load(f)["jobs"]
+
+
+def test_resume_ignores_half_written_event(tmp_path):
+    journal = interrupted_journal(tmp_path)
+    with open(journal.events_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "downloaded", "file_')
+    resumed = RunJournal("run-1", local_dir=str(tmp_path), resume=True)
+    assert resumed.open_jobs() == ["job-2"]
+    assert resumed.is_downloaded("3") and not resumed.is_downloaded("4")
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.lookups import RelationResolver
+from src.site_matcher import SiteMatcher, site_vql_filters
+
+VEEVA_DATA = {"business_area_1": {"10": "Quality", "11": "Safety"}, "business_area_2": {"20": "Operations"}}
+ID_CONFIG = {"siteA": [["10"], ["20"], [], [], [], []]}
+NAME_CONFIG = {"siteA": [["Quality"], ["Operations"], [], [], [], []]}
+
+
+def make_doc(area_1, area_2, **areas):
+    values = {f"impacted_business_area_{i}": areas.get(f"area_{i}") for i in range(3, 7)}
+    return SimpleNamespace(impacted_business_area_1=area_1, impacted_business_area_2=area_2, **values)
+
+
+def resolved(doc):
+    RelationResolver(VEEVA_DATA, relations={"impacted_business_area_1": "business_area_1",
+                                            "impacted_business_area_2": "business_area_2"}).resolve(doc)
+    return doc
+
+
+@pytest.mark.parametrize("config", [ID_CONFIG, NAME_CONFIG], ids=["ids", "names"])
+def test_config_matches_resolved_and_raw_documents(config):
+    matcher = SiteMatcher(config, VEEVA_DATA)
+    assert matcher.match(resolved(make_doc(["10"], ["20"]))) == "siteA"
+    assert matcher.match(make_doc(["10"], ["20"])) == "siteA"
+    assert matcher.match(resolved(make_doc(["11"], ["20"]))) is None
+
+
+def test_config_shapes_build_the_same_vql_filter():
+    assert site_vql_filters(ID_CONFIG, VEEVA_DATA) == site_vql_filters(NAME_CONFIG, VEEVA_DATA)
+
+
+def test_required_and_optional_areas():
+    config = {"siteA": [["Quality"], ["Operations"], ["x"], [], [], []], "siteB": [["Quality"], ["Operations"], [], [], [], []]}
+    matcher = SiteMatcher(config, VEEVA_DATA)
+    # Optional areas pass when the document leaves them empty
+    assert matcher.match(make_doc(["Quality"], ["Operations"])) == "siteA"
+    assert matcher.match(make_doc(["Quality"], ["Operations"], area_3=["y"])) == "siteB"
+    assert matcher.match(make_doc(["Quality"], None)) is None
+
+
+def test_matches_the_first_configured_site():
+    matcher = SiteMatcher({"siteB": NAME_CONFIG["siteA"], "siteA": ID_CONFIG["siteA"]}, VEEVA_DATA)
+    assert matcher.match(make_doc(["Quality"], ["Operations"])) == "siteB"
@@ -0,0 +1,131 @@
+import itertools
+import queue
+from types import SimpleNamespace
+
+import pytest
+
+from src.pipelines import stream_documents
+from src.run_journal import RunJournal
+
+
+def make_doc(file_id):
+    return SimpleNamespace(file_id=file_id, major_version=1, minor_version=0, version_modified_date=None)
+
+
+class FakeVeeva:
+    def __init__(self, pages):
+        self.pages = pages
+        self.queried = []
+        self.jobs = {"job-0": ["1", "2"]}
+        self._ids = itertools.count(1)
+
+    def iter_vql_pages(self, model, execution_type, query):
+        self.queried.append(query)
+        return iter(self.pages[query])
+
+    def submit_export_document_ids(self, file_ids):
+        job_id = f"job-{next(self._ids)}"
+        self.jobs[job_id] = list(file_ids)
+        return job_id
+
+    def log_stats(self):
+        pass
+
+
+class FakePoller:
+    def __init__(self, veeva, **options):
+        self.veeva = veeva
+        self._jobs = queue.Queue()
+
+    def add(self, job_id):
+        self._jobs.put(job_id)
+
+    def close(self):
+        self._jobs.put(None)
+
+    def __iter__(self):
+        while (job_id := self._jobs.get()) is not None:
+            yield job_id, [SimpleNamespace(id=file_id) for file_id in self.veeva.jobs[job_id]], None
+
+
+class FakeEmail:
+    def __init__(self):
+        self.subjects = []
+
+    def format_email(self, subject, body):
+        self.subjects.append(subject)
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """Runs stream_documents against fakes; ``skip`` holds file ids process_document would skip."""
+    state = {"downloads": [], "skip": set(), "email": FakeEmail()}
+    config = {"run_journal": {"local_dir": str(tmp_path)}, "pipeline": {"streaming": {"export_batch_size": 2}}}
+
+    def download_export_documents(docs, veeva, dynamodb, s3, bedrock, on_success=None):
+        state["downloads"].append(sorted(doc.id for doc in docs))
+        uploaded = [doc for doc in docs if doc.id not in state["skip"]]
+        for doc in uploaded:
+            on_success(doc)
+        return [{"status": "OK"} for _ in uploaded], []
+
+    def plan_documents(dynamodb, s3, page, site_matcher, execution_type):
+        return page, {doc.file_id: "CREATE" for doc in page}
+
+    monkeypatch.setattr(stream_documents, "get_veeva_data", lambda veeva, s3: {})
+    monkeypatch.setattr(stream_documents, "update_s3_json_files", lambda s3, data: None)
+    monkeypatch.setattr(stream_documents, "get_impacted_business_areas", lambda execution_type: {})
+    monkeypatch.setattr(stream_documents, "get_site_queries", lambda data, areas, execution_type: dict.fromkeys(state["veeva"].pages))
+    monkeypatch.setattr(stream_documents, "RelationResolver", lambda data: SimpleNamespace(resolve_many=lambda docs: None))
+    monkeypatch.setattr(stream_documents, "SiteMatcher", lambda areas, veeva_data: None)
+    monkeypatch.setattr(stream_documents, "ExportJobPoller", FakePoller)
+    monkeypatch.setattr(stream_documents, "plan_documents", plan_documents)
+    monkeypatch.setattr(stream_documents, "download_export_documents", download_export_documents)
+    monkeypatch.setattr(stream_documents, "delete_withdrawn_documents", lambda veeva, dynamodb, s3: {})
+    monkeypatch.setattr(stream_documents, "advance_watermark", lambda key, values: None)
+    monkeypatch.setattr(stream_documents, "commit_watermarks", lambda: None)
+
+    def start(pages, resume=False):
+        state["veeva"] = FakeVeeva(pages)
+        services = (state["veeva"], SimpleNamespace(log_stats=lambda: None), None, None, state["email"], None, None, None, None, config)
+        monkeypatch.setattr(stream_documents, "initialize_services", lambda: services)
+        job_ids = stream_documents.stream_documents("run-1", "Incremental", resume=resume)
+        assert state["email"].subjects[-1].startswith("[SUCCESS]")
+        return job_ids, RunJournal("run-1", local_dir=str(tmp_path), resume=True)
+
+    state["start"] = start
+    return state
+
+
+def test_journal_key():
+    assert stream_documents.journal_key(make_doc("7")) == "7:1.0"
+
+
+def test_fresh_run_journals_every_download(run):
+    job_ids, journal = run["start"]({"q1": [[make_doc("1"), make_doc("2")], [make_doc("3")]]})
+    assert sorted(run["veeva"].jobs[job_id] for job_id in job_ids) == [["1", "2"], ["3"]]
+    assert all(journal.is_downloaded(file_id) for file_id in ("1", "2", "3"))
+    assert journal.open_jobs() == []
+
+
+def test_resume_continues_after_crash(tmp_path, run):
+    crashed = RunJournal("run-1", local_dir=str(tmp_path))
+    crashed.record_page("q1", ["1:1.0", "2:1.0", "3:1.0"], ["1", "2", "3"])
+    crashed.finish_query("q1")
+    crashed.record_job("job-0", ["1", "2"])
+    crashed.record_downloaded(["1"])
+
+    job_ids, journal = run["start"]({"q1": [[make_doc("1")]], "q2": [[make_doc("4")]]}, resume=True)
+    assert run["veeva"].queried == ["q2"]
+    # Pending export 3 goes out before the newly planned 4; document 1 is not downloaded again
+    assert [run["veeva"].jobs[job_id] for job_id in job_ids] == [["3", "4"]]
+    assert sorted(run["downloads"]) == [["2"], ["3", "4"]]
+    assert journal.open_jobs() == []
+    assert journal.pending_exports() == []
+
+
+def test_skipped_documents_keep_their_job_open(run):
+    run["skip"].add("2")
+    job_ids, journal = run["start"]({"q1": [[make_doc("1"), make_doc("2")]]})
+    assert journal.is_downloaded("1") and not journal.is_downloaded("2")
+    assert journal.open_jobs() == job_ids
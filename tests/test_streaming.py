@@ -0,0 +1,102 @@
+import itertools
+import threading
+
+import pytest
+
+from src.streaming import Stage, StreamingPipeline
+
+
+def run_with_timeout(pipeline, source, timeout=5):
+    result = {}
+
+    def consume():
+        try:
+            result["items"] = list(pipeline.run(source))
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    return result
+
+
+def test_stages_run_in_order():
+    pipeline = StreamingPipeline([
+        Stage("double", lambda xs: (x * 2 for x in xs)),
+        Stage("inc", lambda xs: (x + 1 for x in xs)),
+    ], poll_interval=0.01)
+    assert run_with_timeout(pipeline, range(5))["items"] == [1, 3, 5, 7, 9]
+
+
+def test_stage_failure_stops_every_stage_and_is_reraised():
+    consumed = []
+
+    def source():
+        for i in itertools.count():
+            consumed.append(i)
+            yield i
+
+    def explode(xs):
+        for x in xs:
+            if x == 3:
+                raise RuntimeError("boom")
+            yield x
+
+    pipeline = StreamingPipeline([
+        Stage("pass", lambda xs: xs, queue_size=1),
+        Stage("explode", explode, queue_size=1),
+    ], poll_interval=0.01)
+    result = run_with_timeout(pipeline, source())
+    assert isinstance(result["error"], RuntimeError)
+    assert pipeline._stop.is_set()
+    # Bounded queues: the endless source stops shortly after the failure
+    seen = len(consumed)
+    threading.Event().wait(0.1)
+    assert len(consumed) == seen < 20
+
+
+def test_source_failure_is_reraised():
+    def source():
+        yield 1
+        raise ValueError("bad source")
+
+    pipeline = StreamingPipeline([Stage("pass", lambda xs: xs)], poll_interval=0.01)
+    assert isinstance(run_with_timeout(pipeline, source())["error"], ValueError)
+
+
+def test_end_marker_reaches_every_worker():
+    flushed = []
+
+    def batch(xs):
+        # Each worker flushes its remainder only once it has seen the end marker
+        pending = list(xs)
+        flushed.append(threading.current_thread().name)
+        yield pending
+
+    pipeline = StreamingPipeline([Stage("batch", batch, workers=3, queue_size=1)], poll_interval=0.01)
+    result = run_with_timeout(pipeline, range(10))
+    assert sorted(x for chunk in result["items"] for x in chunk) == list(range(10))
+    assert len(flushed) == 3
+
+
+def test_stopping_consumer_shuts_down_workers():
+    pipeline = StreamingPipeline([Stage("pass", lambda xs: xs, workers=2, queue_size=1)], poll_interval=0.01)
+    items = pipeline.run(itertools.count())
+    assert next(items) in (0, 1)
+    items.close()
+    assert pipeline._stop.is_set()
+
+
+def test_metrics_count_items():
+    stage = Stage("double", lambda xs: (x * 2 for x in xs))
+    pipeline = StreamingPipeline([stage], poll_interval=0.01)
+    run_with_timeout(pipeline, range(4))
+    metrics = pipeline.metrics()[0]
+    assert (metrics["stage"], metrics["items_in"], metrics["items_out"]) == ("double", 4, 4)
+
+
+def test_pipeline_needs_a_stage():
+    with pytest.raises(ValueError):
+        StreamingPipeline([])